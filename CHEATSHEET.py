@@ -39,8 +39,8 @@ QUICK_COMMANDS = """
 
 ━━━━━ 常用变体 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-1. 增加线程数（加速扫描）：
-   python main.py "D:\\project" -t 32
+1. 使用常驻工作进程（加速扫描，进程数默认等于CPU核心数）：
+   python main.py "D:\\project" -e inprocess
 
 2. 自定义输入输出文件：
    python main.py "D:\\project" -i source.xlsx -o results.xlsx
@@ -105,13 +105,21 @@ type scan_progress.json
   -c, --column NAME            路径列列名 [默认: path]
 
 执行相关参数：
-  -t, --threads NUM            并行线程数 [默认: 4]
+  -e, --engine NAME            扫描引擎 subprocess/inprocess/batch [默认: subprocess]
+  -t, --threads NUM            subprocess/batch 引擎并行线程数 [默认: 4]
+  -w, --workers NUM            inprocess 引擎工作进程数 [默认: CPU核心数]
+  --cache [FILE]               按内容哈希缓存结果，相同文件只扫描一次 [默认: 不启用]
+  --worker-memory-mb MB        单个工作进程内存上限 [默认: 不限制]
+  --chunk-size NUM             每次提交给工作进程的文件数 [默认: 8]
 
 断点接续参数：
   -p, --progress-file FILE     进度文件位置 [默认: scan_progress.json]
   --resume                     启用断点接续 [默认启用]
   --skip-resume                跳过断点接续，重新扫描所有
   --reset                      重置进度文件并退出
+  --incremental                增量扫描：按路径/大小/修改时间复用上次结果
+  --progress-backend journal   追加写入进度（大型项目推荐）[默认: json]
+  --progress-backend sqlite    SQLite 进度数据库（超大型项目）
 
 ━━━━━ 场景示例 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
@@ -124,6 +132,9 @@ type scan_progress.json
 场景C - 中断后继续（完全自动，只需运行相同命令）：
   python main.py "D:\\huge_project" -t 32
 
+场景C2 - 一条命令完成遍历+扫描（不生成 input.xlsx，边发现边扫描边保存）：
+  python scan_licenses.py "D:\\huge_project" --discover --pipeline -e inprocess --progress-backend journal
+
 场景D - 完全重新扫描（跳过断点接续）：
   python main.py "D:\\project" --skip-resume
 
@@ -200,10 +211,13 @@ type scan_progress.json
 
 ━━━━━ 性能建议 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 
-线程数选择：
+线程数/进程数选择：
+  -e inprocess 时 license 匹配是CPU密集型，进程数不宜超过CPU核心数
+  (默认 -w 即为核心数)；内存不足时用 --worker-memory-mb 或减小 -w
+  subprocess 引擎：
   CPU 4核  → -t 4  (默认，较保守)
-  CPU 8核  → -t 8  或 -t 16 (平衡)
-  CPU 16核 → -t 16 或 -t 32 (激进)
+  CPU 8核  → -t 8
+  CPU 16核 → -t 16
 
 估计时间（单个小文件1-2秒）：
   100文件 + 4线程   ~ 5-10分钟
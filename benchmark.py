@@ -0,0 +1,537 @@
+"""
+性能基准测试 - 生成合成源码树，依次用各扫描模式运行 scan_licenses.py，
+记录吞吐量、总耗时、峰值内存和启动时间到 JSON 文件，便于跟踪性能回归
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+SCAN_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_licenses.py")
+
+# 语料目录中记录生成参数和统计的文件，参数相同时直接复用已有语料
+MANIFEST_FILE = "benchmark_corpus.json"
+
+# 扫描模式: 名称 -> scan_licenses.py 的额外参数
+MODES = {
+    "subprocess": ["-e", "subprocess"],
+    "batch": ["-e", "batch"],
+    "inprocess": ["-e", "inprocess"],
+    "inprocess-spawn": ["-e", "inprocess", "--index-sharing", "spawn"],
+    "inprocess-fast": ["-e", "inprocess", "--prefilter", "--spdx-fast-path", "--cache"],
+    # 模拟后端且扫描不耗时，只剩调度层（读取清单、提交任务、保存进度、写出结果）的开销
+    "stub": ["-e", "inprocess", "--backend", "stub", "--stub-latency-ms", "0"],
+}
+
+# 合成文件中使用的 license 文本: (SPDX 标识, 文本)
+LICENSE_TEXTS = [
+    (
+        "MIT",
+        """Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.""",
+    ),
+    (
+        "Apache-2.0",
+        """Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.""",
+    ),
+    (
+        "GPL-2.0-or-later",
+        """This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.""",
+    ),
+    (
+        "BSD-3-Clause",
+        """Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions are met:
+
+1. Redistributions of source code must retain the above copyright notice,
+   this list of conditions and the following disclaimer.
+2. Redistributions in binary form must reproduce the above copyright notice,
+   this list of conditions and the following disclaimer in the documentation
+   and/or other materials provided with the distribution.
+3. Neither the name of the copyright holder nor the names of its contributors
+   may be used to endorse or promote products derived from this software
+   without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+AND ANY EXPRESS OR IMPLIED WARRANTIES ARE DISCLAIMED.""",
+    ),
+]
+
+# 源文件扩展名 -> 行注释前缀
+SOURCE_TYPES = {".c": "// ", ".h": "// ", ".py": "# ", ".js": "// ", ".java": "// "}
+
+# 每个子目录中的文件数
+FILES_PER_DIR = 50
+
+
+def _comment(text: str, prefix: str) -> str:
+    """将文本逐行加上注释前缀"""
+    return "".join(f"{prefix}{line}".rstrip() + "\n" for line in text.splitlines())
+
+
+def _source_body(rng: random.Random, size: int, prefix: str) -> str:
+    """生成约 size 字节的类代码文本"""
+    lines = []
+    written = 0
+    n = 0
+    while written < size:
+        n += 1
+        if n % 12 == 0:
+            line = f"{prefix}step {n}: update the buffer state\n"
+        else:
+            line = f"    value_{n} = compute(value_{n - 1}, {rng.randint(0, 9999)});\n"
+        lines.append(line)
+        written += len(line)
+    return "".join(lines)
+
+
+def generate_corpus(
+    corpus_dir: str,
+    files: int = 200,
+    seed: int = 0,
+    median_kb: float = 4,
+    max_kb: float = 512,
+    duplicate_ratio: float = 0.1,
+    spdx_ratio: float = 0.3,
+    license_ratio: float = 0.3,
+    binary_ratio: float = 0.05,
+) -> dict:
+    """
+    生成合成源码树（同样的参数和随机种子生成完全相同的文件）
+
+    文件大小服从对数正态分布（中位数 median_kb，不超过 max_kb）；源文件按比例带
+    SPDX-License-Identifier 行或完整 license 文本头，其余不含 license；
+    部分文件是之前文件的完全副本，部分是二进制内容。
+
+    Args:
+        corpus_dir: 语料目录（已存在时先删除）
+        files: 文件总数
+        seed: 随机种子
+        median_kb: 文件大小中位数（KB）
+        max_kb: 最大文件大小（KB）
+        duplicate_ratio: 内容重复的文件比例
+        spdx_ratio: 带 SPDX 标识的源文件比例
+        license_ratio: 带完整 license 文本头的源文件比例
+        binary_ratio: 二进制文件比例
+
+    Returns:
+        语料清单: {"params", "files", "bytes", "kinds": {类型: 文件数}}
+    """
+    params = {
+        "files": files,
+        "seed": seed,
+        "median_kb": median_kb,
+        "max_kb": max_kb,
+        "duplicate_ratio": duplicate_ratio,
+        "spdx_ratio": spdx_ratio,
+        "license_ratio": license_ratio,
+        "binary_ratio": binary_ratio,
+    }
+    if os.path.exists(corpus_dir):
+        shutil.rmtree(corpus_dir)
+    os.makedirs(corpus_dir)
+
+    rng = random.Random(seed)
+    kinds = {}
+    total_bytes = 0
+    text_files = []
+    for i in range(files):
+        size = int(min(rng.lognormvariate(0, 1) * median_kb, max_kb) * 1024)
+        sub_dir = os.path.join(corpus_dir, f"dir_{i // FILES_PER_DIR:03d}")
+        os.makedirs(sub_dir, exist_ok=True)
+
+        roll = rng.random()
+        if roll < binary_ratio:
+            kind = "binary"
+            path = os.path.join(sub_dir, f"file_{i:05d}{rng.choice(['.bin', '.blob'])}")
+            data = bytes(rng.getrandbits(8) for _ in range(min(size, 4096))) * (size // 4096 + 1)
+            data = b"\x7fELF" + data[: max(size - 4, 0)]
+        elif roll < binary_ratio + duplicate_ratio and text_files:
+            kind = "duplicate"
+            source, data = rng.choice(text_files)
+            path = os.path.join(sub_dir, f"file_{i:05d}{os.path.splitext(source)[1]}")
+        else:
+            ext = rng.choice(list(SOURCE_TYPES))
+            prefix = SOURCE_TYPES[ext]
+            spdx_id, text = rng.choice(LICENSE_TEXTS)
+            header_roll = rng.random()
+            if header_roll < spdx_ratio:
+                kind = "spdx"
+                header = f"{prefix}SPDX-License-Identifier: {spdx_id}\n"
+            elif header_roll < spdx_ratio + license_ratio:
+                kind = "license_text"
+                header = _comment(f"Copyright (c) {2000 + i % 25} Example Authors\n\n{text}", prefix)
+            else:
+                kind = "no_license"
+                header = ""
+            path = os.path.join(sub_dir, f"file_{i:05d}{ext}")
+            data = (header + _source_body(rng, size, prefix)).encode("utf-8")
+            text_files.append((path, data))
+
+        with open(path, "wb") as f:
+            f.write(data)
+        kinds[kind] = kinds.get(kind, 0) + 1
+        total_bytes += len(data)
+
+    manifest = {"params": params, "files": files, "bytes": total_bytes, "kinds": kinds}
+    with open(os.path.join(corpus_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def load_or_generate_corpus(corpus_dir: str, **params) -> dict:
+    """
+    语料目录中已有相同参数生成的语料时直接复用，否则重新生成
+
+    Args:
+        corpus_dir: 语料目录
+        **params: generate_corpus 的生成参数
+
+    Returns:
+        语料清单
+    """
+    manifest_path = os.path.join(corpus_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("params") == params:
+            print(f"✓ 复用已有语料: {corpus_dir}")
+            return manifest
+    except (OSError, ValueError):
+        pass
+    print(f"生成语料: {corpus_dir} ({params['files']} 个文件)")
+    return generate_corpus(corpus_dir, **params)
+
+
+class _RssSampler:
+    """定期采样进程树的内存占用（RSS 之和），需要 psutil"""
+
+    def __init__(self, pid: int, interval: float = 0.2):
+        import psutil
+
+        self.process = psutil.Process(pid)
+        self.psutil = psutil
+        self.interval = interval
+        self.peak = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                processes = [self.process] + self.process.children(recursive=True)
+            except self.psutil.Error:
+                return
+            rss = 0
+            for proc in processes:
+                try:
+                    rss += proc.memory_info().rss
+                except self.psutil.Error:
+                    pass
+            self.peak = max(self.peak, rss)
+
+    def stop(self) -> int:
+        self.stop_event.set()
+        self.thread.join()
+        return self.peak
+
+
+def run_mode(
+    mode: str, corpus_dir: str, corpus_files: int, work_dir: str, threads: int, workers: int
+) -> dict:
+    """
+    用一种扫描模式扫描语料目录，测量耗时和内存
+
+    Args:
+        mode: 扫描模式名称（见 MODES）
+        corpus_dir: 语料目录
+        corpus_files: 语料文件数（用于计算吞吐量，包含缓存命中和内容重复的文件）
+        work_dir: 本次运行的工作目录（日志、进度文件、输出文件、缓存都写在这里）
+        threads: subprocess/batch 引擎的并行线程数
+        workers: inprocess 引擎的工作进程数
+
+    Returns:
+        运行结果: 耗时、文件数、吞吐量、启动时间、峰值内存等
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    profile_file = os.path.join(work_dir, "profile.json")
+    command = [
+        sys.executable,
+        SCAN_SCRIPT,
+        os.path.abspath(corpus_dir),
+        "--discover",
+        "--exclude",
+        MANIFEST_FILE,
+        "-o",
+        "output.csv",
+        "--skip-resume",
+        "--progress-backend",
+        "journal",
+        "--profile",
+        profile_file,
+        "--status-interval",
+        "0",
+        "-t",
+        str(threads),
+        "-w",
+        str(workers),
+    ] + MODES[mode]
+
+    started = time.time()
+    with open(os.path.join(work_dir, "stdout.log"), "w", encoding="utf-8") as out:
+        process = subprocess.Popen(command, cwd=work_dir, stdout=out, stderr=subprocess.STDOUT)
+        sampler = None
+        try:
+            sampler = _RssSampler(process.pid)
+        except ImportError:
+            pass
+        if sampler is None and hasattr(os, "wait4"):
+            # 没有 psutil 时用 wait4 取进程树中单个进程的最大 RSS
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            peak_rss = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            rss_method = "max_process"
+        else:
+            process.wait()
+            peak_rss = sampler.stop() if sampler is not None else None
+            rss_method = "tree_sum" if sampler is not None else None
+    wall = time.time() - started
+
+    result = {
+        "mode": mode,
+        "args": MODES[mode],
+        "returncode": process.returncode,
+        "wall_seconds": round(wall, 3),
+        "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss else None,
+        "peak_rss_method": rss_method,
+    }
+    try:
+        with open(profile_file, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError):
+        return result
+    # 进程启动到第一个结果保存: 性能分析器启动前的耗时 + 分析器记录的首个结果时间
+    startup = None
+    if profile.get("first_result_seconds") is not None:
+        startup = wall - profile["wall_seconds"] + profile["first_result_seconds"]
+    result.update(
+        {
+            "files": corpus_files,
+            # 实际扫描的文件数，不含内容重复的文件
+            "scanned_files": profile["files"],
+            "files_per_second": round(corpus_files / wall, 3) if wall else None,
+            "startup_seconds": round(startup, 3) if startup is not None else None,
+            "scan_p50_seconds": profile["stages"]["scan"]["p50"],
+            "scan_p90_seconds": profile["stages"]["scan"]["p90"],
+            "worker_utilization": profile["worker_utilization"],
+        }
+    )
+    return result
+
+
+def scancode_version():
+    """已安装的 scancode-toolkit 版本，未安装时返回 None"""
+    try:
+        from importlib.metadata import version
+
+        return version("scancode-toolkit")
+    except Exception:
+        return None
+
+
+def run_benchmark(args) -> dict:
+    """
+    生成（或复用）语料并依次运行各扫描模式
+
+    Args:
+        args: 命令行参数
+
+    Returns:
+        基准测试结果
+    """
+    manifest = load_or_generate_corpus(
+        args.corpus,
+        files=args.files,
+        seed=args.seed,
+        median_kb=args.median_kb,
+        max_kb=args.max_kb,
+        duplicate_ratio=args.duplicate_ratio,
+        spdx_ratio=args.spdx_ratio,
+        license_ratio=args.license_ratio,
+        binary_ratio=args.binary_ratio,
+    )
+    print(f"  {manifest['files']} 个文件，{manifest['bytes'] / 1024 / 1024:.1f}MB，{manifest['kinds']}")
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "scancode_version": scancode_version(),
+        "threads": args.threads,
+        "workers": args.workers,
+        "corpus": manifest,
+        "runs": [],
+    }
+    work_root = tempfile.mkdtemp(prefix="scan_benchmark_")
+    try:
+        for mode in args.modes:
+            for repeat in range(args.repeat):
+                print(f"运行模式 {mode}（第 {repeat + 1}/{args.repeat} 次）...")
+                run = run_mode(
+                    mode,
+                    args.corpus,
+                    manifest["files"],
+                    os.path.join(work_root, f"{mode}_{repeat}"),
+                    args.threads,
+                    args.workers,
+                )
+                run["repeat"] = repeat
+                report["runs"].append(run)
+                if run["returncode"] != 0:
+                    print(f"  ✗ 扫描失败 (退出码 {run['returncode']})，日志: {work_root}")
+                    args.keep = True
+                    continue
+                print(
+                    f"  ✓ {run.get('files')} 个文件，{run['wall_seconds']}秒，"
+                    f"{run.get('files_per_second')} 文件/秒，启动 {run.get('startup_seconds')}秒，"
+                    f"峰值内存 {run['peak_rss_mb']}MB"
+                )
+    finally:
+        if args.keep:
+            print(f"工作目录已保留: {work_root}")
+        else:
+            shutil.rmtree(work_root, ignore_errors=True)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✓ 基准测试结果已保存到: {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="生成合成源码树并测量各扫描模式的性能")
+    parser.add_argument(
+        "--corpus",
+        type=str,
+        default="benchmark_corpus",
+        help="语料目录，参数相同时复用已生成的语料 (default: benchmark_corpus)",
+    )
+    parser.add_argument("--files", type=int, default=200, help="语料文件数 (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子 (default: 0)")
+    parser.add_argument(
+        "--median-kb", type=float, default=4, help="文件大小中位数，单位KB (default: 4)"
+    )
+    parser.add_argument(
+        "--max-kb", type=float, default=512, help="最大文件大小，单位KB (default: 512)"
+    )
+    parser.add_argument(
+        "--duplicate-ratio", type=float, default=0.1, help="内容重复的文件比例 (default: 0.1)"
+    )
+    parser.add_argument(
+        "--spdx-ratio", type=float, default=0.3, help="带 SPDX 标识的源文件比例 (default: 0.3)"
+    )
+    parser.add_argument(
+        "--license-ratio",
+        type=float,
+        default=0.3,
+        help="带完整 license 文本头的源文件比例 (default: 0.3)",
+    )
+    parser.add_argument(
+        "--binary-ratio", type=float, default=0.05, help="二进制文件比例 (default: 0.05)"
+    )
+    parser.add_argument(
+        "--modes",
+        type=str,
+        default=",".join(MODES),
+        help=f"要运行的扫描模式，逗号分隔 (default: {','.join(MODES)})",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="每个模式运行次数 (default: 1)")
+    parser.add_argument(
+        "-t", "--threads", type=int, default=4, help="subprocess/batch 引擎并行线程数 (default: 4)"
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=f"inprocess 引擎工作进程数 (default: CPU核心数 {os.cpu_count() or 1})",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default="benchmark_results.json",
+        help="结果 JSON 文件 (default: benchmark_results.json)",
+    )
+    parser.add_argument(
+        "--generate-only", action="store_true", help="只生成语料，不运行扫描"
+    )
+    parser.add_argument(
+        "--keep", action="store_true", help="保留各次运行的工作目录（日志、输出、性能报告）"
+    )
+
+    args = parser.parse_args()
+    args.modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = [m for m in args.modes if m not in MODES]
+    if unknown:
+        parser.error(f"未知的扫描模式: {', '.join(unknown)}（可选: {', '.join(MODES)}）")
+
+    if args.generate_only:
+        manifest = generate_corpus(
+            args.corpus,
+            files=args.files,
+            seed=args.seed,
+            median_kb=args.median_kb,
+            max_kb=args.max_kb,
+            duplicate_ratio=args.duplicate_ratio,
+            spdx_ratio=args.spdx_ratio,
+            license_ratio=args.license_ratio,
+            binary_ratio=args.binary_ratio,
+        )
+        print(f"✓ 语料已生成: {args.corpus} ({manifest['files']} 个文件，{manifest['kinds']})")
+    else:
+        run_benchmark(args)
@@ -2,72 +2,216 @@
 从指定目录生成 input.xlsx，包含所有文件的相对路径
 """
 
+import fnmatch
 import os
+import queue
 import sys
 import argparse
+import threading
+import time
 from pathlib import Path
 import pandas as pd
 
 
-def generate_input_xlsx(source_dir: str, output_file: str = "input.xlsx", max_files: int = None):
+def _matches(rel_path: str, name: str, patterns: list) -> bool:
+    """相对路径（统一为 /）或文件名匹配任一 glob 模式"""
+    rel_posix = rel_path.replace(os.sep, "/")
+    return any(
+        fnmatch.fnmatch(rel_posix, pattern) or fnmatch.fnmatch(name, pattern)
+        for pattern in patterns
+    )
+
+
+def iter_source_files(
+    source_dir: str,
+    include: list = None,
+    exclude: list = None,
+    min_size: int = None,
+    max_size: int = None,
+    workers: int = 8,
+    on_error=None,
+):
+    """
+    并行遍历目录，逐个产出文件
+
+    多个线程共享一个目录队列，每个线程用 os.scandir 列出一个目录后把子目录放回队列，
+    因此各个顶层子目录（以及更深层的子目录）会被并行遍历；文件大小直接取自
+    DirEntry 的 stat 信息（Windows 上无需额外系统调用）。同一目录中的文件按名称排序产出，
+    但各目录之间的先后顺序取决于线程调度，多次遍历的整体顺序不固定，需要稳定顺序时由调用方排序。
+
+    Args:
+        source_dir: 源目录路径
+        include: 只保留匹配任一 glob 的文件（匹配相对路径或文件名），None 表示全部
+        exclude: 排除匹配任一 glob 的文件和目录（匹配的目录不再进入）
+        min_size: 最小文件大小（字节）
+        max_size: 最大文件大小（字节）
+        workers: 遍历线程数
+        on_error: 目录无法读取时的回调，参数为 (目录路径, 异常)，在遍历线程中调用；
+            None 表示忽略
+
+    Yields:
+        (相对路径, 文件名, 文件大小) 元组，相对路径使用系统路径分隔符
+    """
+    include = include or []
+    exclude = exclude or []
+    dirs = queue.Queue()
+    out = queue.Queue(maxsize=64)
+    stop = threading.Event()
+    done = object()
+    dirs.put((source_dir, ""))
+
+    def _put(item):
+        # 消费方提前结束时不再阻塞
+        while not stop.is_set():
+            try:
+                out.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _scan_dir(path: str, rel: str):
+        batch = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    rel_path = os.path.join(rel, entry.name) if rel else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if not _matches(rel_path, entry.name, exclude):
+                                dirs.put((entry.path, rel_path))
+                            continue
+                        if not entry.is_file():
+                            continue
+                        if include and not _matches(rel_path, entry.name, include):
+                            continue
+                        if exclude and _matches(rel_path, entry.name, exclude):
+                            continue
+                        size = entry.stat().st_size
+                    except OSError:
+                        continue
+                    if min_size is not None and size < min_size:
+                        continue
+                    if max_size is not None and size > max_size:
+                        continue
+                    batch.append((rel_path, entry.name, size))
+        except OSError as e:
+            if on_error is not None:
+                on_error(path, e)
+        # 同一目录中的文件按名称排序，每次最多交给消费方 256 个
+        batch.sort()
+        for start in range(0, len(batch), 256):
+            _put(batch[start:start + 256])
+
+    def _worker():
+        while True:
+            item = dirs.get()
+            try:
+                if item is None:
+                    return
+                if not stop.is_set():
+                    _scan_dir(*item)
+            finally:
+                dirs.task_done()
+
+    def _monitor():
+        # 所有目录处理完毕后通知工作线程和消费方结束
+        dirs.join()
+        for _ in range(workers):
+            dirs.put(None)
+        _put(done)
+
+    threads = [threading.Thread(target=_worker, daemon=True) for _ in range(workers)]
+    threads.append(threading.Thread(target=_monitor, daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while True:
+            batch = out.get()
+            if batch is done:
+                return
+            yield from batch
+    finally:
+        stop.set()
+
+
+def generate_input_xlsx(
+    source_dir: str,
+    output_file: str = "input.xlsx",
+    max_files: int = None,
+    include: list = None,
+    exclude: list = None,
+    min_size: int = None,
+    max_size: int = None,
+    workers: int = 8,
+):
     """
     从源目录生成 input.xlsx
-    
+
     Args:
         source_dir: 源目录路径
         output_file: 输出 Excel 文件名
         max_files: 最大文件数量（用于测试），None 表示所有文件
+        include: 只保留匹配任一 glob 的文件
+        exclude: 排除匹配任一 glob 的文件和目录
+        min_size: 最小文件大小（字节）
+        max_size: 最大文件大小（字节）
+        workers: 并行遍历的线程数
     """
     source_path = Path(source_dir).resolve()
-    
+
     if not source_path.exists():
         print(f"错误: 目录不存在: {source_dir}")
         sys.exit(1)
-    
+
     if not source_path.is_dir():
         print(f"错误: 不是目录: {source_dir}")
         sys.exit(1)
-    
+
     print(f"扫描目录: {source_path}")
-    
-    # 发现所有文件（使用 glob 以提高效率）
+
+    # 并行发现所有文件
     files = []
-    count = 0
+    last_report = time.monotonic()
     try:
-        for file_path in source_path.rglob("*"):
-            if file_path.is_file():
-                # 获取相对路径
-                rel_path = file_path.relative_to(source_path)
-                files.append({
-                    "path": str(rel_path),
-                    "file_name": file_path.name
-                })
-                count += 1
-                
-                # 进度提示（每100个文件打印一次）
-                if count % 100 == 0:
-                    print(f"  已扫描 {count} 个文件...")
-                
-                # 检查是否达到最大文件数
-                if max_files and count >= max_files:
-                    files = files[:max_files]
-                    print(f"达到最大文件数限制: {max_files}")
-                    break
+        for rel_path, name, _ in iter_source_files(
+            str(source_path),
+            include,
+            exclude,
+            min_size,
+            max_size,
+            workers,
+            on_error=lambda path, e: print(f"  警告: 无法读取目录 {path}: {e}"),
+        ):
+            files.append({"path": rel_path, "file_name": name})
+
+            # 进度提示（每2秒打印一次）
+            if time.monotonic() - last_report >= 2:
+                print(f"  已扫描 {len(files)} 个文件...")
+                last_report = time.monotonic()
+
+            # 检查是否达到最大文件数
+            if max_files and len(files) >= max_files:
+                print(f"达到最大文件数限制: {max_files}")
+                break
     except KeyboardInterrupt:
         print(f"\n已中断，已扫描 {len(files)} 个文件")
-    
+
+    # 并行遍历的顺序不固定，排序后保证多次生成的行号一致
+    files.sort(key=lambda f: f["path"])
+
     # 创建 DataFrame
-    df = pd.DataFrame(files)
-    
+    df = pd.DataFrame(files, columns=["path", "file_name"])
+
     print(f"发现文件数: {len(df)}")
     if len(df) > 0:
         print("\n前 5 个文件:")
         print(df.head())
-    
+
     # 保存到 Excel
     df.to_excel(output_file, index=False)
     print(f"\n已保存到: {output_file}")
-    
+
     return output_file
 
 
@@ -86,6 +230,45 @@ if __name__ == "__main__":
         default=None,
         help="最大文件数量 (用于测试，default: None，表示全部)"
     )
-    
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="只包含匹配的文件，glob 模式，可多次指定 (例如: --include '*.c' --include '*.h')"
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="排除匹配的文件或目录，glob 模式，可多次指定 (例如: --exclude '.git' --exclude '*.png')"
+    )
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=None,
+        help="最小文件大小，单位字节 (default: 不限制)"
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=None,
+        help="最大文件大小，单位字节 (default: 不限制)"
+    )
+    parser.add_argument(
+        "-w", "--workers",
+        type=int,
+        default=8,
+        help="并行遍历目录的线程数 (default: 8)"
+    )
+
     args = parser.parse_args()
-    generate_input_xlsx(args.source_dir, args.output, args.max)
+    generate_input_xlsx(
+        args.source_dir,
+        args.output,
+        args.max,
+        args.include,
+        args.exclude,
+        args.min_size,
+        args.max_size,
+        args.workers,
+    )
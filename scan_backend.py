@@ -0,0 +1,264 @@
+"""
+扫描后端 - 各扫描引擎通过当前后端加载索引、扫描单个文件或运行命令行
+
+scancode 后端调用 scancode-toolkit；stub 后端不做真正的 license 检测，按文件内容
+确定性地生成结果并模拟可配置的耗时，用于单独测量清单读取、任务提交、进度保存、
+输出写出等调度层的开销。
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+# stub 后端按文件内容哈希从中选择 license（None 表示未检测到）
+STUB_LICENSES = ["MIT", "Apache-2.0", "GPL-2.0-or-later", "BSD-3-Clause", None]
+
+
+class ScancodeBackend:
+    """scancode-toolkit 后端"""
+
+    name = "scancode"
+    # forkserver 方式启动工作进程时预先导入的模块
+    preload_modules = ["licensedcode.cache", "scancode.api"]
+
+    def version(self) -> str:
+        """获取已安装的 scancode-toolkit 版本号"""
+        try:
+            from importlib.metadata import version
+
+            return version("scancode-toolkit")
+        except Exception:
+            return "unknown"
+
+    def load(self):
+        """加载 license 索引（同一进程中只加载一次）"""
+        from licensedcode.cache import get_index
+
+        get_index()
+
+    def scan_file(self, file_path: str, deadline: float, extract: tuple = ()) -> dict:
+        """
+        通过 scancode API 扫描单个文件
+
+        Args:
+            file_path: 文件的完整路径
+            deadline: 截止时间（time.time() 时间戳）
+            extract: 额外提取的字段组，含 copyrights 时额外执行版权检测
+
+        Returns:
+            与 scancode 输出中 files[] 条目格式相同的字典
+        """
+        from scancode.api import get_licenses
+
+        scan_result = get_licenses(file_path, deadline=deadline)
+        if "copyrights" in extract:
+            from scancode.api import get_copyrights
+
+            scan_result.update(get_copyrights(file_path, deadline=deadline))
+        return scan_result
+
+    def run_cli(self, options: list, timeout: int, logger):
+        """
+        运行 scancode 命令行，结果以 JSON 直接输出到标准输出，不经过临时文件
+
+        Args:
+            options: scancode 扫描选项和输入路径（不含输出选项）
+            timeout: 命令超时时间（秒）
+            logger: 日志记录器
+
+        Returns:
+            (files 列表，输出无法解析时为 None, subprocess.CompletedProcess,
+             阶段耗时 {"spawn": 进程启动及加载索引, "scan": scancode 扫描, "parse": 解析 JSON})
+
+        Raises:
+            subprocess.TimeoutExpired: 命令超时
+        """
+        # 使用 python -m scancode 以确保正确的模块加载；--quiet 保证标准输出只有 JSON
+        cmd = [sys.executable, "-m", "scancode.cli", "--quiet", "--json", "-"] + options
+        logger.debug(f"执行命令: {' '.join(cmd)}")
+
+        # 固定子进程输出编码，避免 Windows 下按系统代码页解码中文路径出错
+        started = time.time()
+        process = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            encoding="utf-8",
+            errors="replace",
+            timeout=timeout,
+            env=dict(os.environ, PYTHONIOENCODING="utf-8"),
+        )
+
+        finished = time.time()
+
+        # 只保留 files[]，丢弃 headers 等其余内容
+        try:
+            output = json.loads(process.stdout)
+            files = output.get("files", [])
+            # headers 中的 duration 为 scancode 自身的扫描耗时，其余为进程启动和加载索引
+            duration = float((output.get("headers") or [{}])[0].get("duration") or 0.0)
+        except ValueError:
+            files = None
+            duration = 0.0
+        wall = finished - started
+        duration = min(duration, wall)
+        timings = {"spawn": wall - duration, "scan": duration, "parse": time.time() - finished}
+        return files, process, timings
+
+
+class StubBackend:
+    """
+    模拟后端 - 不调用 scancode，结果只取决于文件内容，耗时可配置
+
+    相同内容的文件在所有引擎下得到相同结果，因此可以直接比较各引擎和调度方式的输出。
+    """
+
+    name = "stub"
+    preload_modules = []
+
+    def __init__(
+        self, latency_ms: float = 10, startup_ms: float = 0, error_rate: float = 0.0
+    ):
+        """
+        初始化模拟后端
+
+        Args:
+            latency_ms: 每个文件的扫描耗时（毫秒）
+            startup_ms: 加载索引（inprocess 每个工作进程一次）或启动命令行（每次调用）的耗时（毫秒）
+            error_rate: 按内容哈希确定性地模拟扫描出错的文件比例
+        """
+        self.latency_ms = latency_ms
+        self.startup_ms = startup_ms
+        self.error_rate = error_rate
+
+    def version(self) -> str:
+        """模拟结果的版本号，耗时不影响结果，因此只包含出错比例"""
+        return f"stub-1;error_rate={self.error_rate}"
+
+    def load(self):
+        """模拟加载 license 索引"""
+        time.sleep(self.startup_ms / 1000)
+
+    def _file_result(self, file_path: str) -> dict:
+        """根据文件开头内容的哈希生成结果，出错时抛出 RuntimeError"""
+        with open(file_path, "rb") as f:
+            digest = hashlib.md5(f.read(65536)).digest()
+        if int.from_bytes(digest[:4], "big") / 2**32 < self.error_rate:
+            raise RuntimeError("stub 后端模拟的扫描错误")
+        expression = STUB_LICENSES[digest[4] % len(STUB_LICENSES)]
+        detections = []
+        if expression is not None:
+            match = {
+                "license_expression_spdx": expression,
+                "start_line": 1,
+                "end_line": 1 + digest[5] % 20,
+                "matcher": "stub",
+                "score": 100.0,
+                "match_coverage": 100.0,
+                "rule_identifier": f"stub_{expression}",
+            }
+            detections.append({"license_expression_spdx": expression, "matches": [match]})
+        return {
+            "detected_license_expression_spdx": expression,
+            "license_detections": detections,
+            "percentage_of_license_text": float(digest[6] % 100) if detections else 0.0,
+            "copyrights": [],
+            "holders": [],
+            "authors": [],
+        }
+
+    def scan_file(self, file_path: str, deadline: float, extract: tuple = ()) -> dict:
+        """
+        模拟扫描单个文件，超过截止时间时只等待到截止时间
+
+        Args:
+            file_path: 文件的完整路径
+            deadline: 截止时间（time.time() 时间戳）
+            extract: 额外提取的字段组（模拟结果总是包含全部字段）
+
+        Returns:
+            与 scancode 输出中 files[] 条目格式相同的字典
+        """
+        time.sleep(max(0.0, min(self.latency_ms / 1000, deadline - time.time())))
+        return self._file_result(file_path)
+
+    def run_cli(self, options: list, timeout: int, logger):
+        """
+        模拟运行 scancode 命令行，输入路径为 options 的最后一项（文件或目录）
+
+        Args:
+            options: scancode 扫描选项和输入路径
+            timeout: 命令超时时间（秒）
+            logger: 日志记录器
+
+        Returns:
+            与 ScancodeBackend.run_cli 相同
+
+        Raises:
+            subprocess.TimeoutExpired: 模拟耗时超过超时时间
+        """
+        target = options[-1]
+        if os.path.isdir(target):
+            # 与 --strip-root 一致，路径相对于输入目录
+            paths = []
+            for root, _, names in os.walk(target):
+                for name in sorted(names):
+                    full_path = os.path.join(root, name)
+                    paths.append((full_path, os.path.relpath(full_path, target).replace(os.sep, "/")))
+        else:
+            paths = [(target, os.path.basename(target))]
+
+        spawn = self.startup_ms / 1000
+        scan = self.latency_ms / 1000 * len(paths)
+        if spawn + scan > timeout:
+            time.sleep(timeout)
+            raise subprocess.TimeoutExpired(["stub"] + options, timeout)
+        time.sleep(spawn + scan)
+
+        files = []
+        for full_path, path in sorted(paths, key=lambda p: p[1]):
+            entry = {"path": path, "type": "file", "scan_errors": []}
+            try:
+                entry.update(self._file_result(full_path))
+            except (OSError, RuntimeError) as e:
+                entry["scan_errors"].append(str(e))
+            files.append(entry)
+        # 与 scancode 一致，有文件出错时返回非零退出码
+        errors = [error for entry in files for error in entry["scan_errors"]]
+        process = subprocess.CompletedProcess(
+            ["stub"] + options, 1 if errors else 0, "", "; ".join(errors)
+        )
+        return files, process, {"spawn": spawn, "scan": scan, "parse": 0.0}
+
+
+_backend = ScancodeBackend()
+
+
+def create_backend(name: str = "scancode", **options):
+    """
+    按名称创建扫描后端
+
+    Args:
+        name: "scancode" 或 "stub"
+        **options: stub 后端的参数（latency_ms、startup_ms、error_rate）
+
+    Returns:
+        后端对象
+    """
+    if name == "stub":
+        return StubBackend(**options)
+    return ScancodeBackend()
+
+
+def get_backend():
+    """获取当前进程使用的扫描后端"""
+    return _backend
+
+
+def set_backend(backend):
+    """设置当前进程使用的扫描后端（inprocess 工作进程在初始化时设置）"""
+    global _backend
+    _backend = backend
@@ -0,0 +1,465 @@
+"""
+分布式扫描 - 协调节点持有清单和进度，通过 HTTP 将文件批次租借给各工作节点扫描
+
+协议（JSON over HTTP，所有请求为 POST，可选 X-Scan-Token 头校验共享口令）:
+    /config     工作节点加入时获取扫描配置（预筛规则、超时、额外提取字段等）
+    /lease      租借一个批次: {"worker"} -> {"lease_id", "batch_id", "tasks": [[idx, relative_path], ...]}，
+                相对路径统一使用 / 分隔；暂无批次时 tasks 为空，扫描全部结束时返回 {"done": true}
+    /heartbeat  续租: {"lease_id"} -> {"valid"}，扫描结束后为 {"valid": false, "done": true}
+    /complete   提交结果: {"lease_id", "batch_id", "results": {idx: 结果字典}} -> {"accepted", "done"}
+
+租约在 lease_seconds 内没有续租或提交即过期，批次重新排队交给其他工作节点；
+同一批次以第一次提交的结果为准（租约过期但批次尚未被其他节点完成时仍然采用）。
+扫描中的工作节点即使租约已过期也继续按间隔续租。扫描结束后，协调节点等待仍可能在
+运行的工作节点（最近 lease_seconds 内联系过，或租约过期后还没有再联系）收到结束通知
+再关闭，最多等待 lease_seconds；收到过结束通知的工作节点之后连接不上协调节点时正常退出。
+"""
+
+import json
+import logging
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class CoordinatorFinished(ConnectionError):
+    """协调节点已通知扫描结束，之后连接不上协调节点属于正常情况"""
+
+
+class ClusterCoordinator:
+    """协调节点 - 作为 cluster 引擎的执行器，submit_batch 返回的 Future 在工作节点提交结果后完成"""
+
+    def __init__(
+        self,
+        bind: str,
+        config: dict,
+        logger: logging.Logger,
+        lease_seconds: float = 300,
+        token: str = None,
+    ):
+        """
+        初始化协调节点
+
+        Args:
+            bind: 监听地址 HOST:PORT
+            config: 下发给工作节点的扫描配置
+            logger: 日志记录器
+            lease_seconds: 租约有效期（秒），工作节点需在此时间内续租或提交结果
+            token: 共享口令，None 表示不校验
+        """
+        host, _, port = bind.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.config = dict(config, lease_seconds=lease_seconds)
+        self.logger = logger
+        self.lease_seconds = lease_seconds
+        self.token = token
+        self.lock = threading.Lock()
+        # 待租借的批次号；过期租约的批次放回队首优先重新分配
+        self.pending = deque()
+        # 批次号 -> {"task": [(idx, full_path, relative_path)], "future": Future}
+        self.batches = {}
+        # 租约号 -> {"batch_id", "worker", "expires"}
+        self.leases = {}
+        self.next_batch_id = 0
+        self.done = False
+        self.workers = set()
+        # 工作节点 -> 最近一次请求的时间；租约过期后还没有再联系的工作节点（可能仍在扫描）；
+        # 已收到结束通知的工作节点
+        self.last_seen = {}
+        self.orphaned = set()
+        self.notified = set()
+        self.reassigned = 0
+        self.server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.shutdown()
+        return False
+
+    def start(self):
+        """启动 HTTP 服务"""
+        coordinator = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if coordinator.token and self.headers.get("X-Scan-Token") != coordinator.token:
+                    self.send_error(403)
+                    return
+                handlers = {
+                    "/config": coordinator.handle_config,
+                    "/lease": coordinator.handle_lease,
+                    "/heartbeat": coordinator.handle_heartbeat,
+                    "/complete": coordinator.handle_complete,
+                }
+                handler = handlers.get(self.path.split("?")[0])
+                if handler is None:
+                    self.send_error(404)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    request = json.loads(self.rfile.read(length) or b"{}")
+                    body = json.dumps(handler(request), ensure_ascii=False).encode("utf-8")
+                except Exception as e:
+                    coordinator.logger.warning(f"处理工作节点请求 {self.path} 出错: {str(e)}")
+                    self.send_error(400, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="scan-coordinator", daemon=True).start()
+        host, port = self.server.server_address[:2]
+        self.logger.info(f"[OK] 协调节点已启动: http://{host}:{port}，租约有效期 {self.lease_seconds}秒")
+
+    def submit_batch(self, task: list) -> Future:
+        """
+        提交一个批次，等待工作节点租借
+
+        Args:
+            task: (idx, full_path, relative_path) 元组列表
+
+        Returns:
+            Future，结果为 {idx: 结果字典}
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        with self.lock:
+            batch_id = self.next_batch_id
+            self.next_batch_id += 1
+            self.batches[batch_id] = {"task": task, "future": future}
+            self.pending.append(batch_id)
+        return future
+
+    def _expire_leases(self):
+        """将过期租约的批次放回队首（调用方持有锁）"""
+        now = time.time()
+        for lease_id, lease in list(self.leases.items()):
+            if lease["expires"] > now:
+                continue
+            del self.leases[lease_id]
+            self.orphaned.add(lease["worker"])
+            if lease["batch_id"] in self.batches and not self.done:
+                self.pending.appendleft(lease["batch_id"])
+                self.reassigned += 1
+                self.logger.warning(
+                    f"[WARN] 工作节点 {lease['worker']} 的租约已过期，"
+                    f"批次 {lease['batch_id']} 重新分配"
+                )
+
+    def _seen(self, worker: str):
+        """记录工作节点的一次请求（调用方持有锁）"""
+        self.last_seen[worker] = time.time()
+        self.orphaned.discard(worker)
+
+    def handle_config(self, request: dict) -> dict:
+        worker = request.get("worker", "?")
+        with self.lock:
+            self._seen(worker)
+            if worker not in self.workers:
+                self.workers.add(worker)
+                self.logger.info(f"[OK] 工作节点加入: {worker}")
+        return self.config
+
+    def handle_lease(self, request: dict) -> dict:
+        worker = request.get("worker", "?")
+        with self.lock:
+            self._seen(worker)
+            self._expire_leases()
+            while self.pending:
+                batch_id = self.pending.popleft()
+                batch = self.batches.get(batch_id)
+                if batch is None:
+                    continue
+                lease_id = uuid.uuid4().hex
+                self.leases[lease_id] = {
+                    "batch_id": batch_id,
+                    "worker": worker,
+                    "expires": time.time() + self.lease_seconds,
+                }
+                return {
+                    "lease_id": lease_id,
+                    "batch_id": batch_id,
+                    # 相对路径统一为 /，工作节点与协调节点的操作系统可以不同
+                    "tasks": [
+                        [idx, str(relative_path).replace("\\", "/")]
+                        for idx, _, relative_path in batch["task"]
+                    ],
+                }
+            done = self.done and not self.batches
+            if done:
+                self.notified.add(worker)
+            return {"done": done, "tasks": []}
+
+    def handle_heartbeat(self, request: dict) -> dict:
+        worker = request.get("worker", "?")
+        with self.lock:
+            self._seen(worker)
+            if self.done:
+                # 扫描已结束：租约作废，通知工作节点
+                self.leases.pop(request.get("lease_id"), None)
+                self.notified.add(worker)
+                return {"valid": False, "done": True}
+            lease = self.leases.get(request.get("lease_id"))
+            if lease is None:
+                return {"valid": False}
+            lease["expires"] = time.time() + self.lease_seconds
+            return {"valid": True}
+
+    def handle_complete(self, request: dict) -> dict:
+        worker = request.get("worker", "?")
+        with self.lock:
+            self._seen(worker)
+            self.leases.pop(request.get("lease_id"), None)
+            # 已重新排队的批次号留在 pending 中，租借时会跳过已完成的批次
+            batch = self.batches.pop(request.get("batch_id"), None)
+            done = self.done
+            if done:
+                self.notified.add(worker)
+        if batch is None:
+            # 租约过期后批次已由其他节点完成（或扫描已结束），丢弃本次结果
+            return {"accepted": False, "done": done}
+
+        full_paths = {idx: full_path for idx, full_path, _ in batch["task"]}
+        results = {}
+        for key, result in (request.get("results") or {}).items():
+            idx = int(key)
+            if idx in full_paths:
+                # 结果中的路径统一为协调节点上的路径
+                result["file_path"] = full_paths[idx]
+                results[idx] = result
+        for idx, full_path in full_paths.items():
+            results.setdefault(
+                idx,
+                {
+                    "file_path": full_path,
+                    "license_expression_spdx": None,
+                    "error": "工作节点未返回该文件的结果",
+                },
+            )
+        batch["future"].set_result(results)
+        return {"accepted": True, "done": done}
+
+    def shutdown(self):
+        """
+        扫描结束时调用：通知工作节点退出并关闭 HTTP 服务
+
+        空闲的工作节点在下一次租借时收到结束通知；仍在扫描（租约过期后已被重新分配的）
+        批次的节点在下一次续租或提交时收到。最多等待 lease_seconds，超过时视为这些节点已退出。
+        """
+        with self.lock:
+            self.done = True
+            unfinished = list(self.batches.values())
+            self.batches.clear()
+            self.pending.clear()
+        for batch in unfinished:
+            batch["future"].cancel()
+        if self.server is None:
+            return
+        deadline = time.time() + self.lease_seconds
+        while time.time() < deadline:
+            with self.lock:
+                self._expire_leases()
+                now = time.time()
+                waiting = [
+                    worker
+                    for worker, seen in self.last_seen.items()
+                    if worker not in self.notified
+                    and (now - seen < self.lease_seconds or worker in self.orphaned)
+                ]
+            if not waiting:
+                break
+            time.sleep(0.1)
+        self.server.shutdown()
+        self.server.server_close()
+        if self.reassigned:
+            self.logger.info(f"租约过期后重新分配的批次: {self.reassigned}")
+
+
+class ClusterWorker:
+    """工作节点 - 循环租借批次、在本机扫描并提交结果，直到协调节点通知结束"""
+
+    def __init__(
+        self,
+        url: str,
+        logger: logging.Logger,
+        token: str = None,
+        poll_seconds: float = 2,
+        connect_seconds: float = 60,
+    ):
+        """
+        初始化工作节点
+
+        Args:
+            url: 协调节点地址，例如 http://10.0.0.5:8765
+            logger: 日志记录器
+            token: 共享口令
+            poll_seconds: 暂无批次时再次租借的间隔（秒）
+            connect_seconds: 连接不上协调节点时持续重试的时间（秒）
+        """
+        self.url = url.rstrip("/")
+        self.logger = logger
+        self.token = token
+        self.poll_seconds = poll_seconds
+        self.connect_seconds = connect_seconds
+        self.name = f"{uuid.uuid4().hex[:8]}"
+        self.stats = {"batches": 0, "files": 0, "rejected": 0}
+        self.stats_lock = threading.Lock()
+        self.error = None
+        # 协调节点是否已通知扫描结束
+        self.finished = False
+
+    def request(self, path: str, payload: dict) -> dict:
+        """
+        向协调节点发送请求，连接失败时在 connect_seconds 内重试
+
+        Args:
+            path: 请求路径
+            payload: 请求内容
+
+        Returns:
+            响应内容
+
+        Raises:
+            CoordinatorFinished: 协调节点通知扫描结束后已关闭
+            ConnectionError: 超过重试时间仍无法连接
+        """
+        data = json.dumps(dict(payload, worker=self.name), ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["X-Scan-Token"] = self.token
+        deadline = time.time() + self.connect_seconds
+        while True:
+            try:
+                req = urllib.request.Request(self.url + path, data=data, headers=headers)
+                with urllib.request.urlopen(req, timeout=60) as resp:
+                    reply = json.loads(resp.read())
+            except urllib.error.HTTPError:
+                raise
+            except (urllib.error.URLError, ConnectionError, TimeoutError) as e:
+                if self.finished:
+                    raise CoordinatorFinished(f"协调节点 {self.url} 已结束扫描")
+                if time.time() > deadline:
+                    raise ConnectionError(f"无法连接协调节点 {self.url}: {str(e)}")
+                time.sleep(self.poll_seconds)
+                continue
+            if reply.get("done"):
+                self.finished = True
+            return reply
+
+    def fetch_config(self, name: str = None) -> dict:
+        """
+        加入协调节点并获取扫描配置
+
+        Args:
+            name: 工作节点名称（例如主机名），None 表示随机生成
+
+        Returns:
+            扫描配置
+        """
+        if name:
+            self.name = f"{name}-{self.name}"
+        config = self.request("/config", {})
+        self.logger.info(f"[OK] 已加入协调节点 {self.url}（工作节点 {self.name}）")
+        return config
+
+    def _heartbeat(self, lease_id: str, stop: threading.Event, interval: float):
+        # 租约过期（批次已重新分配）后仍继续续租，让协调节点知道本节点还在扫描，
+        # 扫描结束时才能通知到本节点
+        while not stop.wait(interval):
+            try:
+                if self.request("/heartbeat", {"lease_id": lease_id}).get("done"):
+                    return
+            except CoordinatorFinished:
+                return
+            except Exception as e:
+                self.logger.warning(f"续租失败: {str(e)}")
+
+    def run(self, scan, lease_seconds: float, concurrency: int = 1):
+        """
+        循环租借并扫描批次，直到协调节点通知扫描结束
+
+        Args:
+            scan: 扫描函数，参数为 [(idx, relative_path)]，返回 {idx: 结果字典}
+            lease_seconds: 租约有效期（秒），按其三分之一的间隔续租
+            concurrency: 同时持有的租约数，扫描一个批次时可预先租借下一个批次
+        """
+        threads = [
+            threading.Thread(
+                target=self._loop, args=(scan, lease_seconds), name=f"scan-lease-{i}"
+            )
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+        self.logger.info(
+            f"[OK] 协调节点已结束扫描，本节点完成 {self.stats['batches']} 个批次 / "
+            f"{self.stats['files']} 个文件"
+            + (f"，{self.stats['rejected']} 个批次因租约过期未被采用" if self.stats["rejected"] else "")
+        )
+
+    def _loop(self, scan, lease_seconds: float):
+        try:
+            self._lease_batches(scan, lease_seconds)
+        except CoordinatorFinished:
+            # 扫描已结束，本节点手上的批次已由其他节点完成
+            return
+        except Exception as e:
+            self.logger.error(f"工作节点出错: {str(e)}")
+            self.error = e
+
+    def _lease_batches(self, scan, lease_seconds: float):
+        while True:
+            if self.error is not None:
+                return
+            lease = self.request("/lease", {})
+            if lease.get("done"):
+                return
+            if not lease.get("tasks"):
+                time.sleep(self.poll_seconds)
+                continue
+
+            stop = threading.Event()
+            heartbeat = threading.Thread(
+                target=self._heartbeat,
+                args=(lease["lease_id"], stop, max(lease_seconds / 3, 1)),
+                daemon=True,
+            )
+            heartbeat.start()
+            try:
+                results = scan([(idx, relative_path) for idx, relative_path in lease["tasks"]])
+            finally:
+                stop.set()
+                heartbeat.join()
+            reply = self.request(
+                "/complete",
+                {
+                    "lease_id": lease["lease_id"],
+                    "batch_id": lease["batch_id"],
+                    "results": {str(k): v for k, v in results.items()},
+                },
+            )
+            with self.stats_lock:
+                if reply.get("accepted"):
+                    self.stats["batches"] += 1
+                    self.stats["files"] += len(lease["tasks"])
+                else:
+                    self.stats["rejected"] += 1
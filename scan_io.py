@@ -0,0 +1,414 @@
+"""
+清单读写工具 - 流式读取 Excel/CSV/Parquet 清单，流式写出带扫描结果的输出文件
+"""
+
+import csv
+import json
+import os
+
+
+def input_format(path: str) -> str:
+    """
+    根据扩展名判断清单文件格式
+
+    Args:
+        path: 清单文件路径
+
+    Returns:
+        "xlsx"、"csv" 或 "parquet"
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".csv", ".txt"):
+        return "csv"
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    return "xlsx"
+
+
+def format_cell(value):
+    """
+    将结果值转换为可写入单元格的值
+
+    字符串列表（如版权声明）按行拼接，其他列表和字典（如检测明细）写为紧凑 JSON。
+
+    Args:
+        value: 扫描结果字典中的值
+
+    Returns:
+        标量值，空列表为 None
+    """
+    if isinstance(value, (list, tuple)):
+        if not value:
+            return None
+        if all(isinstance(v, str) for v in value):
+            return "\n".join(value)
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return value
+
+
+def _empty_to_none(value):
+    """空字符串按空单元格处理"""
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    return value
+
+
+def _iter_xlsx(rows, col_index: int):
+    """逐行产出 Excel 指定列的值，行号与 pandas.read_excel 的索引一致"""
+    # pandas 会去掉表格末尾的空行，中间的空行保留为 NaN；这里推迟输出空行以保持一致
+    pending_empty = 0
+    for row in rows:
+        if row is None or all(_empty_to_none(v) is None for v in row):
+            pending_empty += 1
+            continue
+        for _ in range(pending_empty):
+            yield None
+        pending_empty = 0
+        yield _empty_to_none(row[col_index]) if col_index < len(row) else None
+
+
+def _iter_csv(f, reader, column: str):
+    """逐行产出 CSV 指定列的值，读取结束后关闭文件"""
+    try:
+        for row in reader:
+            yield _empty_to_none(row.get(column))
+    finally:
+        f.close()
+
+
+def _iter_parquet(parquet_file, column: str, batch_size: int):
+    """按批读取 Parquet 的指定列"""
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=[column]):
+        for value in batch.column(0).to_pylist():
+            yield _empty_to_none(value)
+
+
+def open_input_column(path: str, column: str, batch_size: int = 10000):
+    """
+    打开清单文件并返回指定列的流式迭代器
+
+    列名在打开时立即校验；数据行在迭代时才逐行读取，
+    不会像 pandas.read_excel 那样先把整个表格载入内存。
+
+    Args:
+        path: 清单文件路径（.xlsx / .csv / .parquet）
+        column: 包含文件路径的列名
+        batch_size: Parquet 每批读取的行数
+
+    Returns:
+        迭代器，依次产出每个数据行该列的值（空单元格为 None）
+
+    Raises:
+        ValueError: 清单中不存在该列
+        ImportError: 读取 Parquet 但未安装 pyarrow
+    """
+    fmt = input_format(path)
+
+    if fmt == "csv":
+        f = open(path, "r", encoding="utf-8-sig", newline="")
+        reader = csv.DictReader(f)
+        if column not in (reader.fieldnames or []):
+            f.close()
+            raise ValueError(f"输入文件中不存在'{column}'列")
+        return _iter_csv(f, reader, column)
+
+    if fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取 Parquet 文件需要安装 pyarrow: pip install pyarrow")
+        parquet_file = pq.ParquetFile(path)
+        if column not in parquet_file.schema_arrow.names:
+            raise ValueError(f"输入文件中不存在'{column}'列")
+        return _iter_parquet(parquet_file, column, batch_size)
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    header = [str(h) if h is not None else None for h in header]
+    if column not in header:
+        workbook.close()
+        raise ValueError(f"输入文件中不存在'{column}'列")
+
+    def _rows():
+        try:
+            yield from _iter_xlsx(rows, header.index(column))
+        finally:
+            workbook.close()
+
+    return _rows()
+
+
+def read_input_table(path: str):
+    """
+    将整个清单读取为 DataFrame（用于生成输出文件）
+
+    Args:
+        path: 清单文件路径
+
+    Returns:
+        pandas.DataFrame
+    """
+    import pandas as pd
+
+    fmt = input_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path, encoding="utf-8-sig")
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    return pd.read_excel(path)
+
+
+def _iter_xlsx_rows(rows, width: int):
+    """逐行产出 Excel 数据行（补齐到表头宽度），空行处理与 _iter_xlsx 一致"""
+    pending_empty = 0
+    for row in rows:
+        if row is None or all(_empty_to_none(v) is None for v in row):
+            pending_empty += 1
+            continue
+        for _ in range(pending_empty):
+            yield [None] * width
+        pending_empty = 0
+        row = list(row[:width])
+        yield row + [None] * (width - len(row))
+
+
+def open_input_table(path: str, batch_size: int = 10000):
+    """
+    打开清单文件，返回表头和逐行读取全部列的迭代器
+
+    数据行的顺序和编号与 open_input_column 完全一致。
+
+    Args:
+        path: 清单文件路径（.xlsx / .csv / .parquet）
+        batch_size: Parquet 每批读取的行数
+
+    Returns:
+        (表头列表, 数据行迭代器)，每个数据行是与表头等长的列表
+    """
+    fmt = input_format(path)
+
+    if fmt == "csv":
+        f = open(path, "r", encoding="utf-8-sig", newline="")
+        reader = csv.reader(f)
+        header = next(reader, [])
+
+        def _rows():
+            try:
+                for row in reader:
+                    if not row:
+                        continue
+                    row = [_empty_to_none(v) for v in row[: len(header)]]
+                    yield row + [None] * (len(header) - len(row))
+            finally:
+                f.close()
+
+        return header, _rows()
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(path)
+        header = list(parquet_file.schema_arrow.names)
+
+        def _rows():
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                columns = [batch.column(i).to_pylist() for i in range(batch.num_columns)]
+                yield from (list(row) for row in zip(*columns))
+
+        return header, _rows()
+
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = list(next(rows, None) or ())
+
+    def _rows():
+        try:
+            yield from _iter_xlsx_rows(rows, len(header))
+        finally:
+            workbook.close()
+
+    return header, _rows()
+
+
+class _XlsxWriter:
+    """openpyxl 只写模式，逐行追加，内存占用与行数无关"""
+
+    def __init__(self, path: str, header: list):
+        from openpyxl import Workbook
+
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(header)
+
+    def write(self, row: list):
+        self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class _CsvWriter:
+    """CSV 逐行写出（带 BOM 的 UTF-8，便于 Excel 直接打开中文）"""
+
+    def __init__(self, path: str, header: list):
+        self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+
+    def write(self, row: list):
+        self.writer.writerow(row)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    """Parquet 分批写出，所有列按可空字符串保存以保证各批次结构一致"""
+
+    def __init__(self, path: str, header: list, batch_size: int = 10000):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.header = [str(h) for h in header]
+        self.schema = pa.schema([(name, pa.string()) for name in self.header])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, row: list):
+        self.rows.append([None if v is None else str(v) for v in row])
+        if len(self.rows) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.rows:
+            return
+        columns = list(zip(*self.rows))
+        self.writer.write_table(
+            self.pa.Table.from_arrays(
+                [self.pa.array(col, type=self.pa.string()) for col in columns],
+                schema=self.schema,
+            )
+        )
+        self.rows = []
+
+    def close(self):
+        self._flush()
+        self.writer.close()
+
+
+def open_output_writer(path: str, header: list):
+    """
+    按扩展名创建流式输出写入器（.xlsx / .csv / .parquet）
+
+    Args:
+        path: 输出文件路径
+        header: 表头
+
+    Returns:
+        具有 write(row) 和 close() 方法的写入器
+    """
+    fmt = input_format(path)
+    if fmt == "csv":
+        return _CsvWriter(path, header)
+    if fmt == "parquet":
+        try:
+            return _ParquetWriter(path, header)
+        except ImportError:
+            raise ImportError("写出 Parquet 文件需要安装 pyarrow: pip install pyarrow")
+    return _XlsxWriter(path, header)
+
+
+def write_output_stream(
+    input_path: str, output_path: str, results, result_columns: list
+) -> dict:
+    """
+    逐行合并清单与扫描结果并流式写出
+
+    清单和结果都按行号升序读取，用归并方式对齐，不需要把任何一方整体载入内存。
+
+    Args:
+        input_path: 输入清单路径
+        output_path: 输出文件路径
+        results: 按行号升序产出 (idx, result) 的迭代器
+        result_columns: [(输出列名, 结果字典中的键)] 列表
+
+    Returns:
+        统计字典: {"rows": 输出行数, "detected": 第一个结果列非空的行数}
+    """
+    header, rows = open_input_table(input_path)
+    writer = open_output_writer(output_path, header + [name for name, _ in result_columns])
+    stats = {"rows": 0, "detected": 0}
+    results = iter(results)
+    next_result = next(results, None)
+    try:
+        for idx, row in enumerate(rows):
+            # 跳过行号小于当前行的结果（例如清单已缩短）
+            while next_result is not None and next_result[0] < idx:
+                next_result = next(results, None)
+            values = [None] * len(result_columns)
+            if next_result is not None and next_result[0] == idx:
+                result = next_result[1]
+                values = [format_cell(result.get(key)) for _, key in result_columns]
+                next_result = next(results, None)
+            if values and values[0] is not None:
+                stats["detected"] += 1
+            writer.write(row + values)
+            stats["rows"] += 1
+    finally:
+        writer.close()
+    return stats
+
+
+def write_results_stream(
+    output_path: str, results, columns: list, detect_key: str
+) -> dict:
+    """
+    不依赖输入清单，直接将扫描结果逐行写出（目录发现模式）
+
+    Args:
+        output_path: 输出文件路径
+        results: 产出 (idx, result) 的迭代器
+        columns: [(输出列名, 结果字典中的键)] 列表
+        detect_key: 判断是否检测到 license 的结果键
+
+    Returns:
+        统计字典: {"rows": 输出行数, "detected": detect_key 非空的行数}
+    """
+    writer = open_output_writer(output_path, [name for name, _ in columns])
+    stats = {"rows": 0, "detected": 0}
+    try:
+        for _, result in results:
+            writer.write([format_cell(result.get(key)) for _, key in columns])
+            stats["rows"] += 1
+            if result.get(detect_key) is not None:
+                stats["detected"] += 1
+    finally:
+        writer.close()
+    return stats
+
+
+def write_output_table(df, path: str):
+    """
+    按扩展名将 DataFrame 写出为 .xlsx / .csv / .parquet
+
+    Args:
+        df: pandas.DataFrame
+        path: 输出文件路径
+    """
+    fmt = input_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_excel(path, index=False)
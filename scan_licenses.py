@@ -4,18 +4,56 @@ Scans multiple files in parallel and extracts SPDX license information.
 """
 
 import argparse
+import gc
+import gzip
+import hashlib
+import itertools
 import json
 import logging
+import multiprocessing
 import os
+import queue
+import shutil
+import socket
+import sqlite3
 import subprocess
 import sys
 import tempfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+    wait,
+)
 from datetime import datetime
 from pathlib import Path
 
 import pandas as pd
 
+from gen_input_from_dir import iter_source_files
+from scan_prefilter import (
+    LICENSE_CUES,
+    get_spdx_licensing,
+    load_prefilter_rules,
+    prefilter_result,
+    spdx_expressions_equivalent,
+)
+from scan_backend import create_backend, get_backend, set_backend
+from scan_cluster import ClusterCoordinator, ClusterWorker
+from scan_profile import RunProfiler
+from scan_status import ScanStatus, StatusReporter
+from scan_io import (
+    format_cell,
+    open_input_column,
+    read_input_table,
+    write_output_stream,
+    write_output_table,
+    write_results_stream,
+)
+
 
 class ProgressManager:
     """进度管理器 - 用于断点接续功能"""
@@ -60,11 +98,27 @@ class ProgressManager:
         """获取已完成的扫描结果"""
         return self.progress.copy()
 
+    def iter_completed(self):
+        """按行号升序逐条遍历已完成的扫描结果，产出 (idx, result)，不复制整个进度字典"""
+        for idx in sorted(int(idx_str) for idx_str in self.progress):
+            yield idx, self.progress[str(idx)]
+
     def add(self, idx: int, result: dict):
         """添加扫描结果"""
         self.progress[str(idx)] = result
         self.save()
 
+    def add_many(self, items):
+        """
+        批量添加扫描结果，全部添加后只保存一次（用于增量扫描复用、缓存命中等批量写入）
+
+        Args:
+            items: (idx, result) 的可迭代对象
+        """
+        for idx, result in items:
+            self.progress[str(idx)] = result
+        self.save()
+
     def get(self, idx: int) -> dict:
         """获取指定的扫描结果"""
         return self.progress.get(str(idx))
@@ -73,6 +127,10 @@ class ProgressManager:
         """检查是否已扫描"""
         return str(idx) in self.progress
 
+    def completed_indexes(self) -> set:
+        """获取已扫描行号的集合（断点接续时在主线程一次取出，供其他线程查询）"""
+        return {int(idx_str) for idx_str in self.progress}
+
     def reset(self):
         """重置进度"""
         self.progress = {}
@@ -84,153 +142,2260 @@ class ProgressManager:
         """获取已完成的扫描数"""
         return len(self.progress)
 
+    def close(self):
+        """结束扫描时调用，JSON 进度文件每次添加后已保存，无需额外处理"""
 
-def setup_logging(log_dir: str = ".") -> logging.Logger:
-    """设置日志记录"""
-    log_file = os.path.join(
-        log_dir,
-        f"scan_licenses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log",
-    )
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[
-            logging.FileHandler(log_file, encoding="utf-8"),
-            logging.StreamHandler(sys.stdout),
-        ],
-    )
-    logger = logging.getLogger(__name__)
-    # 为 StreamHandler 设置 UTF-8 编码错误处理
-    for handler in logger.handlers:
-        if isinstance(handler, logging.StreamHandler):
-            handler.setFormatter(
-                logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+
+class JournalProgressManager(ProgressManager):
+    """
+    追加写入式进度管理器 - 每个结果追加一行紧凑 JSON（JSONL）
+
+    与 ProgressManager 每次重写整个 JSON 文件不同，每个结果的写入开销是常数；
+    fsync 按条数/时间间隔批量执行。加载时合并重复记录并重写文件（压缩），
+    崩溃导致的最后一行不完整会被忽略。
+    """
+
+    def __init__(
+        self,
+        progress_file: str,
+        logger: logging.Logger,
+        fsync_every: int = 100,
+        fsync_interval: float = 2.0,
+    ):
+        """
+        初始化追加写入式进度管理器
+
+        Args:
+            progress_file: 进度文件路径（JSONL）
+            logger: 日志记录器
+            fsync_every: 每追加多少条记录执行一次 fsync
+            fsync_interval: 距上次 fsync 超过多少秒时执行 fsync
+        """
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self._journal = None
+        self._pending = 0
+        self._last_fsync = time.monotonic()
+        super().__init__(progress_file, logger)
+
+    def load(self):
+        """从 JSONL 文件加载进度，并压缩为每个文件一条记录"""
+        self.progress = {}
+        if not os.path.exists(self.progress_file):
+            self.logger.info("开始全新扫描，未找到进度文件")
+            return
+
+        bad_lines = 0
+        total_lines = 0
+        try:
+            with open(self.progress_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    total_lines += 1
+                    try:
+                        record = json.loads(line)
+                        self.progress[str(record["idx"])] = record["result"]
+                    except (ValueError, KeyError, TypeError):
+                        # 通常是崩溃时写了一半的最后一行
+                        bad_lines += 1
+        except Exception as e:
+            self.logger.warning(f"加载进度文件失败: {str(e)}，将从头开始")
+            self.progress = {}
+            return
+
+        if bad_lines:
+            self.logger.warning(f"[WARN] 进度文件中有 {bad_lines} 行不完整，已忽略")
+        self.logger.info(
+            f"[OK] 已加载进度文件，包含 {len(self.progress)} 个已扫描文件"
+        )
+        if bad_lines or total_lines > len(self.progress):
+            self._compact()
+
+    def _compact(self):
+        """将内存中的进度重写为紧凑的 JSONL 文件（先写临时文件再替换）"""
+        temp_file = f"{self.progress_file}.tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                for idx, result in self.progress.items():
+                    f.write(self._format_record(idx, result))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.progress_file)
+            self.logger.info(f"[OK] 进度文件已压缩: {len(self.progress)} 条记录")
+        except Exception as e:
+            self.logger.error(f"压缩进度文件失败: {str(e)}")
+
+    @staticmethod
+    def _format_record(idx, result: dict) -> str:
+        """将一条结果格式化为一行 JSON"""
+        return (
+            json.dumps(
+                {"idx": int(idx), "result": result},
+                ensure_ascii=False,
+                separators=(",", ":"),
             )
-            # 设置编码错误处理为替换不可编码的字符
-            if hasattr(handler.stream, 'buffer'):
-                import io
-                handler.stream = io.TextIOWrapper(
-                    handler.stream.buffer, encoding='utf-8', errors='replace'
-                )
-    logger.info(f"日志文件已保存到: {log_file}")
-    return logger
+            + "\n"
+        )
 
+    def save(self):
+        """将已追加的记录刷新到磁盘"""
+        if self._journal is None:
+            return
+        try:
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+        except Exception as e:
+            self.logger.error(f"保存进度文件失败: {str(e)}")
+        self._pending = 0
+        self._last_fsync = time.monotonic()
 
-def scan_file_with_scancode(
-    file_path: str, temp_json_path: str, logger: logging.Logger, debug_dir: str = None
-) -> dict:
+    def add(self, idx: int, result: dict):
+        """追加一条扫描结果"""
+        self.add_many([(idx, result)])
+
+    def add_many(self, items):
+        """
+        批量追加扫描结果，全部写入后刷新一次
+
+        Args:
+            items: (idx, result) 的可迭代对象
+        """
+        try:
+            if self._journal is None:
+                self._journal = open(self.progress_file, "a", encoding="utf-8")
+            for idx, result in items:
+                self.progress[str(idx)] = result
+                self._journal.write(self._format_record(idx, result))
+                self._pending += 1
+            # 写入操作系统缓冲区，进程崩溃不会丢失；fsync 批量执行
+            self._journal.flush()
+        except Exception as e:
+            self.logger.error(f"保存进度文件失败: {str(e)}")
+            return
+        if (
+            self._pending >= self.fsync_every
+            or time.monotonic() - self._last_fsync >= self.fsync_interval
+        ):
+            self.save()
+
+    def reset(self):
+        """重置进度"""
+        self.close()
+        super().reset()
+
+    def close(self):
+        """刷新并关闭进度文件"""
+        if self._journal is not None:
+            self.save()
+            self._journal.close()
+            self._journal = None
+
+
+class SqliteProgressManager(ProgressManager):
     """
-    使用scancode扫描单个文件 (通过命令行)
+    SQLite 进度与结果存储 - 结果按行号、文件路径、文件内容哈希建立索引
+
+    内容哈希取自结果中的 content_hash（启用 --cache 或 --incremental-hash 时才计算），
+    写入时不再读取文件。使用 WAL 模式；扫描结果通过队列交给单独的写入线程批量提交，
+    断点接续的查询、统计和报告生成都是索引查询，不在内存中保存整个进度字典。
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            idx INTEGER PRIMARY KEY,
+            file_path TEXT,
+            content_hash TEXT,
+            license_expression_spdx TEXT,
+            error TEXT,
+            result TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_file_path ON results(file_path);
+        CREATE INDEX IF NOT EXISTS idx_results_content_hash ON results(content_hash);
+    """
+
+    def __init__(self, progress_file: str, logger: logging.Logger, batch_size: int = 500):
+        """
+        初始化 SQLite 进度管理器
+
+        Args:
+            progress_file: SQLite 数据库文件路径
+            logger: 日志记录器
+            batch_size: 写入线程每个事务最多提交的结果数
+        """
+        self.batch_size = batch_size
+        self._conn = None
+        self._queue = None
+        self._writer = None
+        self._count = 0
+        self._added = set()
+        # 保护查询连接 _conn 以及 _added、_count：查询可能来自任意线程，
+        # add() 则由结果记录线程调用
+        self._lock = threading.Lock()
+        super().__init__(progress_file, logger)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        创建数据库连接
+
+        写入线程使用自己的连接；查询连接 _conn 允许跨线程使用，所有访问都需持有 _lock
+        """
+        conn = sqlite3.connect(self.progress_file, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self):
+        """打开数据库并启动写入线程"""
+        exists = os.path.exists(self.progress_file)
+        try:
+            self._conn = self._connect()
+            self._conn.executescript(self._SCHEMA)
+            self._count = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except Exception as e:
+            self.logger.warning(f"加载进度数据库失败: {str(e)}，将从头开始")
+            if self._conn is not None:
+                self._conn.close()
+            for path in self._db_files():
+                if os.path.exists(path):
+                    os.remove(path)
+            self._conn = self._connect()
+            self._conn.executescript(self._SCHEMA)
+            self._count = 0
+
+        if exists:
+            self.logger.info(f"[OK] 已加载进度数据库，包含 {self._count} 个已扫描文件")
+        else:
+            self.logger.info("开始全新扫描，未找到进度文件")
+
+        self._added = set()
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="progress-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _db_files(self) -> list:
+        """数据库文件及 WAL 附属文件"""
+        return [self.progress_file, f"{self.progress_file}-wal", f"{self.progress_file}-shm"]
+
+    def _writer_loop(self):
+        """写入线程：从队列取出结果并批量提交"""
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    break
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                        break
+                    batch.append(item)
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO results "
+                            "(idx, file_path, content_hash, license_expression_spdx, error, result) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            [self._to_row(idx, result) for idx, result in batch],
+                        )
+                except Exception as e:
+                    self.logger.error(f"保存进度数据库失败: {str(e)}")
+                for _ in batch:
+                    self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+                    break
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_row(idx: int, result: dict) -> tuple:
+        """将扫描结果转换为数据库行（结果中没有内容哈希时该列为空）"""
+        return (
+            int(idx),
+            result.get("file_path"),
+            result.get("content_hash"),
+            result.get("license_expression_spdx"),
+            result.get("error"),
+            json.dumps(result, ensure_ascii=False, separators=(",", ":")),
+        )
+
+    def save(self):
+        """等待写入线程提交所有排队的结果"""
+        if self._queue is not None:
+            self._queue.join()
+
+    def get_completed(self) -> dict:
+        """获取已完成的扫描结果（会读取全部结果，大型项目请使用 iter_completed）"""
+        return {str(idx): result for idx, result in self.iter_completed()}
+
+    def iter_completed(self, page_size: int = 1000):
+        """
+        按行号顺序逐条读取已完成的扫描结果
+
+        每次持锁读取一页，两页之间不持有锁，遍历期间其他线程仍可查询或添加结果
+
+        Args:
+            page_size: 每次查询读取的行数
+        """
+        self.save()
+        last_idx = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT idx, result FROM results WHERE idx > ? ORDER BY idx LIMIT ?",
+                    (last_idx, page_size),
+                ).fetchall()
+            for idx, result in rows:
+                yield idx, json.loads(result)
+            if len(rows) < page_size:
+                break
+            last_idx = rows[-1][0]
+
+    def add(self, idx: int, result: dict):
+        """将扫描结果交给写入线程"""
+        with self._lock:
+            if idx not in self._added and not self._exists_locked(idx):
+                self._count += 1
+            self._added.add(idx)
+        self._queue.put((idx, result))
+
+    def add_many(self, items):
+        """将多条扫描结果交给写入线程（写入线程本身按批提交）"""
+        for idx, result in items:
+            self.add(idx, result)
+
+    def get(self, idx: int) -> dict:
+        """获取指定的扫描结果"""
+        self.save()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT result FROM results WHERE idx = ?", (int(idx),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def exists(self, idx: int) -> bool:
+        """检查是否已扫描"""
+        with self._lock:
+            return self._exists_locked(idx)
+
+    def _exists_locked(self, idx: int) -> bool:
+        """检查是否已扫描（调用方需持有 _lock）"""
+        if idx in self._added:
+            return True
+        row = self._conn.execute(
+            "SELECT 1 FROM results WHERE idx = ?", (int(idx),)
+        ).fetchone()
+        return row is not None
+
+    def completed_indexes(self) -> set:
+        """获取已扫描行号的集合（断点接续时在主线程一次取出，供其他线程查询）"""
+        self.save()
+        with self._lock:
+            done = {idx for (idx,) in self._conn.execute("SELECT idx FROM results")}
+            return done | self._added
+
+    def reset(self):
+        """重置进度"""
+        self.close()
+        removed = False
+        for path in self._db_files():
+            if os.path.exists(path):
+                os.remove(path)
+                removed = True
+        if removed:
+            self.logger.info("[OK] 进度文件已重置")
+        self.load()
+
+    def count(self) -> int:
+        """获取已完成的扫描数"""
+        with self._lock:
+            return self._count
+
+    def close(self):
+        """停止写入线程并关闭数据库"""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def file_content_hash(file_path: str) -> str:
+    """
+    计算文件内容的 SHA-256 哈希
 
     Args:
-        file_path: 文件的完整路径
-        temp_json_path: 临时JSON文件的路径
-        logger: 日志记录器
-        debug_dir: 调试目录，若提供则保存 JSON 结果
+        file_path: 文件路径
 
     Returns:
-        包含扫描结果的字典
+        十六进制哈希字符串，文件无法读取时返回 None
     """
-    result = {"file_path": file_path, "license_expression_spdx": None, "error": None}
-
+    digest = hashlib.sha256()
     try:
-        # 检查文件是否存在
-        if not os.path.exists(file_path):
-            error_msg = f"文件不存在: {file_path}"
-            logger.warning(error_msg)
-            result["error"] = error_msg
-            return result
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
 
-        logger.info(f"开始扫描文件: {file_path}")
-
-        # 构建 scancode 命令 - 使用 python -m scancode 以确保正确的模块加载
-        cmd = [
-            sys.executable,
-            "-m",
-            "scancode.cli",
-            "--license",
-            "--json-pp",
-            temp_json_path,
-            file_path,
-        ]
-        logger.debug(f"执行命令: {' '.join(cmd)}")
 
-        # 执行scancode
-        process = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5分钟超时
+class ResultCache:
+    """
+    扫描结果缓存 - 以文件内容哈希为键，跨多次扫描复用结果
+
+    缓存键同时包含 scancode 版本和扫描选项，任一变化都不会命中旧结果；
+    条目数超过上限时按最近使用时间淘汰（打开和关闭时各检查一次，异常退出的运行
+    不会让缓存无限增长）。查询可能在提交线程中进行，所有操作由锁保护。
+    """
+
+    def __init__(
+        self,
+        cache_file: str,
+        scan_key: str,
+        logger: logging.Logger,
+        max_entries: int = 500000,
+    ):
+        """
+        初始化结果缓存
+
+        Args:
+            cache_file: 缓存数据库文件路径
+            scan_key: scancode 版本与扫描选项组成的键
+            logger: 日志记录器
+            max_entries: 最多保留的缓存条目数
+        """
+        self.scan_key = scan_key
+        self.logger = logger
+        self.max_entries = max_entries
+        self._pending = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(cache_file, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cache (
+                content_hash TEXT NOT NULL,
+                scan_key TEXT NOT NULL,
+                result TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (content_hash, scan_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_cache_last_used ON cache(last_used);
+            """
         )
+        count = self._evict()
+        self.conn.commit()
+        self.logger.info(f"[OK] 已加载结果缓存 {cache_file}，包含 {count} 条记录")
+
+    def get(self, content_hash: str) -> dict:
+        """
+        查找缓存的扫描结果
+
+        Args:
+            content_hash: 文件内容哈希
+
+        Returns:
+            缓存的结果字段（不含 file_path/error），未命中返回 None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT result FROM cache WHERE content_hash = ? AND scan_key = ?",
+                (content_hash, self.scan_key),
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE cache SET last_used = ? WHERE content_hash = ? AND scan_key = ?",
+                (time.time(), content_hash, self.scan_key),
+            )
+            self._maybe_commit()
+        return json.loads(row[0])
+
+    def put(self, content_hash: str, result: dict):
+        """
+        保存扫描结果（出错的结果不缓存）
+
+        Args:
+            content_hash: 文件内容哈希
+            result: 扫描结果字典
+        """
+        if not content_hash or result.get("error"):
+            return
+        cached = {
+            k: v
+            for k, v in result.items()
+            if k
+            not in (
+                "file_path",
+                "error",
+                "content_hash",
+                "cached",
+                "no_cue",
+                "spdx_identifier",
+                "timings",
+            )
+        }
+        row = json.dumps(cached, ensure_ascii=False, separators=(",", ":"))
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (content_hash, scan_key, result, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (content_hash, self.scan_key, row, time.time()),
+            )
+            self._maybe_commit()
+
+    def _maybe_commit(self):
+        """每累计一定数量的修改提交一次（调用方持有锁）"""
+        self._pending += 1
+        if self._pending >= 100:
+            self.conn.commit()
+            self._pending = 0
+
+    def _evict(self) -> int:
+        """
+        淘汰超出上限的最久未使用条目（调用方负责提交）
+
+        Returns:
+            淘汰后的条目数
+        """
+        count = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                "DELETE FROM cache WHERE rowid IN "
+                "(SELECT rowid FROM cache ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            self.logger.info(f"[OK] 结果缓存已淘汰 {count - self.max_entries} 条旧记录")
+            count = self.max_entries
+        return count
+
+    def close(self):
+        """提交修改、淘汰超出上限的旧条目并关闭缓存"""
+        with self.lock:
+            try:
+                self._evict()
+                self.conn.commit()
+            finally:
+                self.conn.close()
+
+
+class DebugArchive:
+    """
+    调试归档 - 将 scancode 原始结果追加写入一个 gzip 压缩的 JSONL 文件
+
+    每行一条记录 {"idx", "file_path", "scan"}，以 Excel 行号为键，
+    同名文件不会互相覆盖；每次运行追加一个新的 gzip 段，同一行号以最后一条为准。
+    只在主线程中使用。
+    """
+
+    def __init__(self, archive_file: str, logger: logging.Logger):
+        """
+        初始化调试归档
+
+        Args:
+            archive_file: 归档文件路径（.jsonl.gz）
+            logger: 日志记录器
+        """
+        self.archive_file = archive_file
+        self.logger = logger
+        self.count = 0
+        self.file = gzip.open(archive_file, "at", encoding="utf-8", compresslevel=6)
+
+    def write(self, idx: int, file_path: str, scan_result):
+        """
+        追加一条 scancode 原始结果
+
+        Args:
+            idx: Excel 行号
+            file_path: 文件的完整路径
+            scan_result: scancode 的单文件原始结果
+        """
+        record = {"idx": int(idx), "file_path": file_path, "scan": scan_result}
+        self.file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self.count += 1
+
+    def close(self):
+        """关闭归档文件"""
+        self.file.close()
+        self.logger.info(f"[OK] 调试归档已写入 {self.count} 条记录: {self.archive_file}")
+
+
+def scan_cache_key(extract: tuple = ()) -> str:
+    """
+    结果缓存键：扫描后端及其版本 + 扫描选项
+
+    Args:
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS），提取内容不同的结果分别缓存
+    """
+    options = ",".join(["license"] + sorted(extract))
+    backend = get_backend()
+    return f"{backend.name}={backend.version()};options={options}"
+
+
+class ResultCacheStage:
+    """
+    结果缓存阶段 - 在任务流中逐批计算内容哈希，命中缓存的文件不再提交扫描，
+    与在途文件内容相同的文件等代表文件扫描完成后直接复用其结果
+
+    文件仍然边读取/发现边提交，流式输入和流水线模式不受影响。任务流可能由提交线程
+    （--pipeline）消费，命中的结果先暂存，由主线程的结果记录器批量写入进度。
+    """
+
+    def __init__(self, result_cache: ResultCache, hash_threads: int = 8, hash_batch: int = 64):
+        """
+        初始化结果缓存阶段
+
+        Args:
+            result_cache: 结果缓存
+            hash_threads: 计算哈希的线程数
+            hash_batch: 每批并行计算哈希的文件数
+        """
+        self.result_cache = result_cache
+        self.hash_threads = hash_threads
+        self.hash_batch = hash_batch
+        self.lock = threading.Lock()
+        # 在途的代表文件: {内容哈希: idx} 与 {idx: 内容哈希}
+        self.representatives = {}
+        self.content_hashes = {}
+        # {代表文件 idx: [内容相同的其他 (idx, full_path, relative_path)]}
+        self.duplicates = {}
+        # 缓存命中、尚未写入进度的 (idx, result)
+        self.hits = []
+        self.hit_count = 0
+        self.duplicate_count = 0
+
+    def filter(self, files_to_scan):
+        """
+        计算哈希并过滤待扫描文件
+
+        Args:
+            files_to_scan: (idx, full_path, relative_path) 元组的可迭代对象
+
+        Yields:
+            仍需扫描的 (idx, full_path, relative_path) 元组
+        """
+        iterator = iter(files_to_scan)
+        with ThreadPoolExecutor(max_workers=self.hash_threads) as executor:
+            while True:
+                batch = list(itertools.islice(iterator, self.hash_batch))
+                if not batch:
+                    return
+                hashes = executor.map(file_content_hash, [p for _, p, _ in batch])
+                for (idx, full_path, relative_path), content_hash in zip(batch, hashes):
+                    if content_hash is None:
+                        # 无法读取的文件交给扫描流程报告错误
+                        yield idx, full_path, relative_path
+                        continue
+
+                    cached = self.result_cache.get(content_hash)
+                    if cached is not None:
+                        result = {"file_path": full_path, "error": None, **cached}
+                        result["content_hash"] = content_hash
+                        result["cached"] = True
+                        result["relative_path"] = normalize_relative_path(relative_path)
+                        with self.lock:
+                            self.hits.append((idx, result))
+                            self.hit_count += 1
+                        continue
+
+                    with self.lock:
+                        representative = self.representatives.get(content_hash)
+                        if representative is not None:
+                            self.duplicates.setdefault(representative, []).append(
+                                (idx, full_path, relative_path)
+                            )
+                            self.duplicate_count += 1
+                            continue
+                        self.representatives[content_hash] = idx
+                        self.content_hashes[idx] = content_hash
+                    yield idx, full_path, relative_path
+
+    def take_hits(self) -> list:
+        """取出已命中缓存、尚未写入进度的结果"""
+        with self.lock:
+            hits, self.hits = self.hits, []
+        return hits
+
+    def take(self, idx: int):
+        """
+        代表文件扫描完成时取出其内容哈希和内容相同的文件
+
+        之后再出现的相同内容文件改为查询结果缓存（结果不可缓存时重新扫描）。
+
+        Args:
+            idx: 扫描完成的文件行号
+
+        Returns:
+            (内容哈希，未计算时为 None, [内容相同的其他 (idx, full_path, relative_path)])
+        """
+        with self.lock:
+            content_hash = self.content_hashes.pop(idx, None)
+            if content_hash is not None:
+                self.representatives.pop(content_hash, None)
+            return content_hash, self.duplicates.pop(idx, [])
+
+
+def normalize_relative_path(relative_path) -> str:
+    """统一相对路径的写法（使用 / 分隔），用于按路径匹配结果"""
+    return str(relative_path).replace("\\", "/")
+
+
+def file_fingerprint(file_path: str, relative_path) -> dict:
+    """
+    获取文件指纹（相对路径、大小、修改时间），用于增量扫描
+
+    Args:
+        file_path: 文件的完整路径
+        relative_path: Excel 中的相对路径
+
+    Returns:
+        指纹字典，文件不存在时返回 None
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return {
+        "relative_path": normalize_relative_path(relative_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def plan_incremental_scan(
+    rows: list,
+    progress_mgr: ProgressManager,
+    logger: logging.Logger,
+    use_hash: bool = False,
+    required_keys: tuple = (),
+):
+    """
+    增量扫描规划：按相对路径匹配上次结果，大小和修改时间未变的文件直接复用
+
+    上次的结果按相对路径取出后，进度存储会按本次 Excel 的行号重建，
+    因此重新排序或重新生成 input.xlsx 不影响复用。
+
+    Args:
+        rows: (idx, full_path, relative_path) 元组列表
+        progress_mgr: 进度管理器
+        logger: 日志记录器
+        use_hash: 大小相同但修改时间变化时，是否再比较内容哈希
+        required_keys: 上次结果必须包含的键（本次要求提取而上次未提取的字段需重新扫描）
+
+    Returns:
+        (需要扫描的文件列表, {idx: 文件指纹})
+    """
+    previous = {}
+    for _, result in progress_mgr.iter_completed():
+        if result.get("relative_path") is not None:
+            previous[result["relative_path"]] = result
+    progress_mgr.reset()
+
+    files_to_scan = []
+    fingerprints = {}
+    reused = []
+    unchanged = changed = added = 0
+    for idx, full_path, relative_path in rows:
+        fingerprint = file_fingerprint(full_path, relative_path)
+        if fingerprint is None:
+            # 不存在的文件交给扫描流程报告错误
+            files_to_scan.append((idx, full_path, relative_path))
+            continue
+        fingerprints[idx] = fingerprint
+
+        prev = previous.pop(fingerprint["relative_path"], None)
+        if prev is None:
+            added += 1
+            files_to_scan.append((idx, full_path, relative_path))
+            continue
+
+        # 预筛跳过和 SPDX 快速识别的结果不复用，重新按本次规则判断（两者开销都很小）
+        reuse = (
+            prev.get("error") is None
+            and not prev.get("skipped")
+            and not prev.get("fast_path")
+            and all(key in prev for key in required_keys)
+            and prev.get("size") == fingerprint["size"]
+        )
+        if reuse and prev.get("mtime") != fingerprint["mtime"]:
+            reuse = False
+            if use_hash and prev.get("content_hash"):
+                fingerprint["content_hash"] = file_content_hash(full_path)
+                reuse = fingerprint["content_hash"] == prev["content_hash"]
+        if not reuse:
+            changed += 1
+            files_to_scan.append((idx, full_path, relative_path))
+            continue
+
+        unchanged += 1
+        reused.append((idx, dict(prev, file_path=full_path, **fingerprint)))
+
+    # 复用的结果一次写入（JSON 进度文件逐条添加时每条都要重写整个文件）
+    progress_mgr.add_many(reused)
+
+    if use_hash:
+        # 记录待扫描文件的内容哈希，下次修改时间变化时可据此判断内容是否相同
+        for idx, full_path, _ in files_to_scan:
+            if idx in fingerprints and "content_hash" not in fingerprints[idx]:
+                fingerprints[idx]["content_hash"] = file_content_hash(full_path)
+
+    logger.info(
+        f"[OK] 增量扫描: 未变化 {unchanged} 个，已变化 {changed} 个，新增 {added} 个，"
+        f"已删除 {len(previous)} 个，本次需扫描 {len(files_to_scan)} 个"
+    )
+    for removed_path in sorted(previous)[:20]:
+        logger.info(f"   已删除: {removed_path}")
+    if len(previous) > 20:
+        logger.info(f"   ... 另有 {len(previous) - 20} 个已删除文件")
+    return files_to_scan, fingerprints
+
+
+# 逐个文件的日志（扫描结果、逐个进度）带此标记，默认只写入日志文件，控制台输出定期汇总行
+PER_FILE_LOG = {"per_file": True}
+
+
+def _console_filter(record: logging.LogRecord) -> bool:
+    """控制台不输出逐个文件的日志"""
+    return not getattr(record, "per_file", False)
+
+
+def setup_logging(log_dir: str = ".", verbose: bool = False) -> logging.Logger:
+    """
+    设置日志记录
+
+    Args:
+        log_dir: 日志文件目录
+        verbose: 控制台是否也输出逐个文件的日志（日志文件总是记录）
+    """
+    log_file = os.path.join(
+        log_dir,
+        f"scan_licenses_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log",
+    )
+    console = logging.StreamHandler(sys.stdout)
+    if not verbose:
+        console.addFilter(_console_filter)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        handlers=[
+            logging.FileHandler(log_file, encoding="utf-8"),
+            console,
+        ],
+    )
+    logger = logging.getLogger(__name__)
+    # 为 StreamHandler 设置 UTF-8 编码错误处理
+    for handler in logger.handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+            )
+            # 设置编码错误处理为替换不可编码的字符
+            if hasattr(handler.stream, 'buffer'):
+                import io
+                handler.stream = io.TextIOWrapper(
+                    handler.stream.buffer, encoding='utf-8', errors='replace'
+                )
+    logger.info(f"日志文件已保存到: {log_file}")
+    return logger
+
+
+def extract_license_spdx(file_result: dict):
+    """
+    从 scancode 的单文件结果中提取 SPDX license 表达式
+
+    Args:
+        file_result: scancode 输出中 files[] 的单个条目，或 scancode.api.get_licenses 的返回值
+
+    Returns:
+        SPDX license 表达式，未检测到时返回 None
+    """
+    # 方案1: 首先尝试从 detected_license_expression_spdx 获取（最直接）
+    license_spdx = file_result.get("detected_license_expression_spdx")
+
+    # 方案2: 如果没有，从 license_detections 中获取
+    if not license_spdx and file_result.get("license_detections"):
+        license_spdx = file_result["license_detections"][0].get(
+            "license_expression_spdx"
+        )
+
+    return license_spdx
+
+
+# 可额外提取的字段组: 字段组名 -> [(输出列名, 扫描结果字典中的键)]
+EXTRACT_FIELDS = {
+    # 每个 license 检测: SPDX 表达式、起止行、最低匹配分数和覆盖率
+    "detections": [("license_detections_scancode", "license_detections")],
+    # 每个匹配的明细: 匹配方式、规则、分数、覆盖率、起止行
+    "matches": [("license_matches_scancode", "license_matches")],
+    # 汇总分数: 所有匹配中的最低分数、最低覆盖率，以及 license 文本占比
+    "scores": [
+        ("license_min_score_scancode", "license_min_score"),
+        ("license_min_coverage_scancode", "license_min_coverage"),
+        ("license_text_percent_scancode", "percentage_of_license_text"),
+    ],
+    # 版权信息（需要 scancode 额外执行 copyright 检测）
+    "copyrights": [
+        ("copyrights_scancode", "copyrights"),
+        ("holders_scancode", "holders"),
+        ("authors_scancode", "authors"),
+    ],
+}
+
+
+def extract_columns(extract: tuple) -> list:
+    """
+    获取额外提取字段组对应的输出列
+
+    Args:
+        extract: 字段组名列表
+
+    Returns:
+        [(输出列名, 扫描结果字典中的键)] 列表
+    """
+    return [column for group in extract for column in EXTRACT_FIELDS[group]]
+
+
+def extract_scan_fields(file_result: dict, extract: tuple) -> dict:
+    """
+    从 scancode 的单文件结果中提取额外字段（同一次扫描的结果，不需要重新扫描）
+
+    Args:
+        file_result: scancode 输出中 files[] 的单个条目，或 scancode.api 的返回值
+        extract: 字段组名列表（见 EXTRACT_FIELDS）
+
+    Returns:
+        {结果键: 值}，列表值在写出时转换为文本
+    """
+    fields = {}
+    detections = file_result.get("license_detections") or []
+    matches = [m for d in detections for m in d.get("matches") or []]
+
+    if "detections" in extract:
+        fields["license_detections"] = [
+            {
+                "license_expression_spdx": d.get("license_expression_spdx"),
+                "start_line": min((m["start_line"] for m in d.get("matches") or []), default=None),
+                "end_line": max((m["end_line"] for m in d.get("matches") or []), default=None),
+                "score": min((m["score"] for m in d.get("matches") or []), default=None),
+                "coverage": min(
+                    (m["match_coverage"] for m in d.get("matches") or []), default=None
+                ),
+            }
+            for d in detections
+        ]
+    if "matches" in extract:
+        fields["license_matches"] = [
+            {
+                "license_expression_spdx": m.get("license_expression_spdx"),
+                "matcher": m.get("matcher"),
+                "rule_identifier": m.get("rule_identifier"),
+                "score": m.get("score"),
+                "coverage": m.get("match_coverage"),
+                "start_line": m.get("start_line"),
+                "end_line": m.get("end_line"),
+            }
+            for m in matches
+        ]
+    if "scores" in extract:
+        fields["license_min_score"] = min((m["score"] for m in matches), default=None)
+        fields["license_min_coverage"] = min((m["match_coverage"] for m in matches), default=None)
+        fields["percentage_of_license_text"] = file_result.get("percentage_of_license_text")
+    if "copyrights" in extract:
+        fields["copyrights"] = [c["copyright"] for c in file_result.get("copyrights") or []]
+        fields["holders"] = [h["holder"] for h in file_result.get("holders") or []]
+        fields["authors"] = [a["author"] for a in file_result.get("authors") or []]
+    return fields
+
+
+# 工作进程加载 license 索引的耗时，随该进程返回的第一个结果报告一次
+_worker_init_seconds = None
+
+
+def _init_scancode_worker(memory_limit_mb: int = None, backend=None):
+    """
+    进程池初始化函数 - 在工作进程启动时预先导入 scancode 并加载 license 索引
+
+    索引只在每个工作进程中加载一次，之后该进程处理的所有文件都直接复用，
+    不再像命令行模式那样为每个文件重新启动解释器和加载索引。
+    工作进程由已加载索引的主进程 fork 而来时（见 preload_scancode_index），这里直接返回已有索引。
+
+    Args:
+        memory_limit_mb: 单个工作进程的内存上限（MB），仅在支持 resource 模块的系统上生效
+        backend: 扫描后端（spawn/forkserver 方式启动的进程不继承主进程的设置），None 表示不变
+    """
+    if memory_limit_mb:
+        try:
+            import resource
+
+            limit = int(memory_limit_mb * 1024 * 1024)
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            # Windows 等平台不支持 RLIMIT_AS，由主进程给出提示
+            pass
+
+    global _worker_init_seconds
+    started = time.time()
+    if backend is not None:
+        set_backend(backend)
+    get_backend().load()
+    _worker_init_seconds = time.time() - started
+
+
+def preload_scancode_index() -> float:
+    """
+    在主进程中加载 license 索引，供之后 fork 出的工作进程通过写时复制共享
+
+    索引对象加载后移入垃圾回收的永久代，子进程中的垃圾回收不会再扫描（写入）这些对象，
+    共享的内存页因此不会被逐个复制，增加工作进程不再成倍增加启动时间和内存。
+
+    Returns:
+        加载索引的耗时（秒）
+    """
+    started = time.time()
+    get_backend().load()
+    gc.collect()
+    gc.freeze()
+    return time.time() - started
+
+
+def worker_start_method(index_sharing: str, max_tasks_per_worker: int, logger: logging.Logger) -> str:
+    """
+    确定 inprocess 工作进程的启动方式
+
+    Args:
+        index_sharing: --index-sharing 参数（auto / fork / forkserver / spawn）
+        max_tasks_per_worker: 每个工作进程处理的任务块上限，None 表示不重启
+        logger: 日志记录器
+
+    Returns:
+        multiprocessing 启动方式: fork 主进程加载索引后 fork 共享;
+        forkserver 由预先导入 scancode 的服务进程 fork; spawn 每个进程各自加载
+    """
+    available = multiprocessing.get_all_start_methods()
+    method = index_sharing
+    if method == "auto":
+        # macOS 上 fork 后使用部分系统库不安全，Windows 不支持 fork
+        method = "fork" if sys.platform.startswith("linux") else "spawn"
+    if method == "fork" and max_tasks_per_worker:
+        logger.warning("[WARN] fork 方式不支持 --max-tasks-per-worker，改用 forkserver")
+        method = "forkserver"
+    if method == "fork" and threading.active_count() > 1:
+        # 其他线程持有的锁会被复制到子进程中且永远不会释放
+        logger.warning("[WARN] 主进程中已有其他线程在运行，fork 可能死锁，改用 forkserver")
+        method = "forkserver"
+    if method not in available:
+        logger.warning(f"[WARN] 当前平台不支持 {method} 方式启动工作进程，改用 spawn")
+        method = "spawn"
+    return method
+
+
+def scan_file_inprocess(
+    file_path: str,
+    timeout: int = 300,
+    prefilter_rules: dict = None,
+    debug: bool = False,
+    extract: tuple = (),
+) -> dict:
+    """
+    在当前进程中通过 scancode API 扫描单个文件（需先调用 _init_scancode_worker）
+
+    该函数运行在工作进程中，不写日志，由主进程根据返回结果记录。
+
+    Args:
+        file_path: 文件的完整路径
+        timeout: 单个文件的扫描超时时间（秒）
+        prefilter_rules: 预筛规则，None 表示不预筛
+        debug: 是否在结果的 debug 键中返回 scancode 原始结果
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+
+    Returns:
+        包含扫描结果的字典，格式与 scan_file_with_scancode 相同
+    """
+    result = {"file_path": file_path, "license_expression_spdx": None, "error": None}
+
+    if not os.path.exists(file_path):
+        result["error"] = f"文件不存在: {file_path}"
+        return result
+
+    prefiltered = prefilter_result(file_path, prefilter_rules, result)
+    if prefiltered is not None:
+        return prefiltered
+
+    try:
+        started = time.time()
+        deadline = started + timeout
+        scan_result = get_backend().scan_file(file_path, deadline, extract)
+        scanned = time.time()
+        result["license_expression_spdx"] = extract_license_spdx(scan_result)
+        result.update(extract_scan_fields(scan_result, extract))
+        result["timings"] = {"scan": scanned - started, "parse": time.time() - scanned}
+        if debug:
+            result["debug"] = scan_result
+        # 到达截止时间时 scancode 只返回已匹配的部分结果，按超时处理
+        if time.time() >= deadline:
+            result["error"] = f"扫描超时 ({timeout}秒)"
+            result["timed_out"] = True
+    except MemoryError:
+        result["error"] = "扫描出错: 超出工作进程内存上限"
+    except Exception as e:
+        result["error"] = f"扫描出错: {str(e)}"
+
+    return result
+
+
+def scan_chunk_inprocess(
+    chunk: list, prefilter_rules: dict = None, debug: bool = False, extract: tuple = ()
+) -> dict:
+    """
+    在工作进程中依次扫描一组文件，减少进程间任务提交和结果传输的次数
+
+    Args:
+        chunk: (idx, full_path, 超时秒数) 元组列表
+        prefilter_rules: 预筛规则，None 表示不预筛
+        debug: 是否在结果中返回 scancode 原始结果
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+
+    Returns:
+        {idx: 扫描结果字典}
+    """
+    global _worker_init_seconds
+    results = {}
+    for idx, file_path, timeout in chunk:
+        started = time.time()
+        result = scan_file_inprocess(file_path, timeout, prefilter_rules, debug, extract)
+        result.setdefault("timings", {}).update(
+            start=started, busy=time.time() - started, worker=f"pid-{os.getpid()}"
+        )
+        if _worker_init_seconds is not None:
+            result["timings"]["init"] = _worker_init_seconds
+            _worker_init_seconds = None
+        results[idx] = result
+    return results
+
+
+def run_scancode_cli(options: list, timeout: int, logger: logging.Logger):
+    """
+    通过当前扫描后端运行 scancode 命令行（见 ScancodeBackend.run_cli）
+
+    Args:
+        options: scancode 扫描选项和输入路径（不含输出选项）
+        timeout: 命令超时时间（秒）
+        logger: 日志记录器
+
+    Returns:
+        (files 列表，输出无法解析时为 None, subprocess.CompletedProcess, 阶段耗时)
+
+    Raises:
+        subprocess.TimeoutExpired: 命令超时
+    """
+    return get_backend().run_cli(options, timeout, logger)
+
+
+def scancode_cli_options(extract: tuple = ()) -> list:
+    """
+    根据需要提取的字段组生成 scancode 命令行的检测选项
+
+    Args:
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+
+    Returns:
+        选项列表
+    """
+    options = ["--license"]
+    if "copyrights" in extract:
+        options.append("--copyright")
+    return options
+
+
+def scan_file_with_scancode(
+    file_path: str,
+    logger: logging.Logger,
+    debug: bool = False,
+    prefilter_rules: dict = None,
+    timeout: int = 300,
+    extract: tuple = (),
+    display_path: str = None,
+) -> dict:
+    """
+    使用scancode扫描单个文件 (通过命令行)
+
+    Args:
+        file_path: 文件的完整路径
+        logger: 日志记录器
+        debug: 是否在结果的 debug 键中返回 scancode 原始结果（由主线程写入调试归档）
+        prefilter_rules: 预筛规则，None 表示不预筛
+        timeout: 扫描超时时间（秒）
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+        display_path: 日志和结果中使用的路径（重试扫描截取的文件开头时为原文件路径），
+            None 表示与 file_path 相同
+
+    Returns:
+        包含扫描结果的字典
+    """
+    display_path = display_path or file_path
+    result = {"file_path": display_path, "license_expression_spdx": None, "error": None}
+
+    try:
+        # 检查文件是否存在
+        if not os.path.exists(file_path):
+            error_msg = f"文件不存在: {display_path}"
+            logger.warning(error_msg)
+            result["error"] = error_msg
+            return result
+
+        prefiltered = prefilter_result(file_path, prefilter_rules, result)
+        if prefiltered is not None:
+            if prefiltered.get("skipped"):
+                logger.info(
+                    f"文件 {display_path} 预筛跳过: {prefiltered['skipped']}", extra=PER_FILE_LOG
+                )
+            else:
+                logger.info(
+                    f"文件 {display_path} 由 SPDX 标识识别，license: "
+                    f"{prefiltered['license_expression_spdx']}",
+                    extra=PER_FILE_LOG,
+                )
+            return prefiltered
+
+        logger.info(f"开始扫描文件: {display_path}", extra=PER_FILE_LOG)
+
+        # 执行scancode
+        files, process, timings = run_scancode_cli(
+            scancode_cli_options(extract) + [file_path], timeout, logger
+        )
+        result["timings"] = timings
+
+        if process.returncode != 0:
+            error_msg = f"scancode扫描失败: {process.stderr}"
+            logger.error(f"文件 {display_path}: {error_msg}")
+            result["error"] = error_msg
+            return result
+
+        if files is None:
+            error_msg = "scancode 输出的 JSON 无法解析"
+            logger.error(f"文件 {display_path}: {error_msg}")
+            result["error"] = error_msg
+            return result
+
+        # 提取license_expression_spdx
+        license_spdx = None
+        if files:
+            license_spdx = extract_license_spdx(files[0])
+            result.update(extract_scan_fields(files[0], extract))
+            if debug:
+                result["debug"] = files[0]
+
+        result["license_expression_spdx"] = license_spdx
+        logger.info(
+            f"文件 {display_path} 扫描完成，检测到license: {license_spdx or '无'}",
+            extra=PER_FILE_LOG,
+        )
+
+        return result
+
+    except subprocess.TimeoutExpired:
+        error_msg = f"扫描超时 ({timeout}秒)"
+        logger.error(f"文件 {display_path}: {error_msg}")
+        result["error"] = error_msg
+        result["timed_out"] = True
+        return result
+    except Exception as e:
+        error_msg = f"扫描出错: {str(e)}"
+        logger.error(f"文件 {display_path}: {error_msg}")
+        result["error"] = error_msg
+        return result
+
+
+# 输出文件中追加的列: (列名, 扫描结果字典中的键)
+OUTPUT_COLUMNS = [("license_expression_spdx_scancode", "license_expression_spdx")]
+
+# 启用预筛时追加的列: 跳过原因
+PREFILTER_COLUMNS = [("scancode_skipped", "skipped")]
+
+# 启用 SPDX 快速识别时追加的列: 文件中的 SPDX-License-Identifier
+SPDX_COLUMNS = [("spdx_license_identifier", "spdx_identifier")]
+
+
+def merge_results_into_dataframe(df, results, columns: list = None):
+    """
+    将扫描结果按行号一次性合并到 DataFrame（向量化赋值，不逐行 .loc）
+
+    Args:
+        df: 输入清单 DataFrame（原地添加结果列）
+        results: 产出 (idx, result) 的迭代器
+        columns: [(输出列名, 结果字典中的键)] 列表，默认为 OUTPUT_COLUMNS
+    """
+    columns = columns or OUTPUT_COLUMNS
+    indices = []
+    values = {name: [] for name, _ in columns}
+    for idx, result in results:
+        indices.append(idx)
+        for name, key in columns:
+            values[name].append(format_cell(result.get(key)))
+    for name, _ in columns:
+        column = pd.Series(values[name], index=indices, dtype=object)
+        # 行号超出清单范围的结果（例如清单已缩短）被丢弃
+        df[name] = column.reindex(df.index)
+
+
+def join_prefix(prefix: str, relative_path) -> str:
+    """
+    将清单中的相对路径与前缀拼接为完整路径
+
+    Args:
+        prefix: 相对路径的前缀
+        relative_path: 相对路径
+
+    Returns:
+        规范化后的完整路径
+    """
+    # 规范化路径：将正斜杠转换为反斜杠（Windows）并移除路径混淆
+    normalized_path = str(relative_path).replace('/', os.sep)
+    return os.path.normpath(os.path.join(prefix, normalized_path))
+
+
+def iter_input_files(
+    column_values, prefix: str, logger: logging.Logger, skip=None, counts: dict = None
+):
+    """
+    将清单中的相对路径逐行转换为待扫描文件
+
+    Args:
+        column_values: 路径列的值的迭代器（见 scan_io.open_input_column）
+        prefix: 相对路径的前缀
+        logger: 日志记录器
+        skip: 可选，idx -> bool 的函数，返回 True 的行（如已扫描）被跳过
+        counts: 可选，统计字典，累加 "rows"（总行数）和 "skipped"（跳过数）
+
+    Yields:
+        (idx, full_path, relative_path) 元组
+    """
+    counts = counts if counts is not None else {}
+    counts.setdefault("rows", 0)
+    counts.setdefault("skipped", 0)
+    for idx, relative_path in enumerate(column_values):
+        counts["rows"] += 1
+        if relative_path is None or pd.isna(relative_path):
+            logger.warning(f"第 {idx + 2} 行的path列为空")
+            continue
+        full_path = join_prefix(prefix, relative_path)
+
+        if skip is not None and skip(idx):
+            counts["skipped"] += 1
+            logger.debug(f"跳过已扫描文件: {full_path}")
+            continue
+
+        yield idx, full_path, relative_path
+
+
+# 按大小计算超时: 基础秒数 + 每MB秒数，不超过 --timeout
+ADAPTIVE_TIMEOUT_BASE = 30
+ADAPTIVE_TIMEOUT_PER_MB = 60
+
+# 超时文件重试时只扫描文件开头的大小（KB），license 声明通常位于文件开头
+RETRY_HEAD_KB = 256
+
+
+def file_timeout(file_path: str, max_timeout: int, adaptive: bool = False) -> int:
+    """
+    计算单个文件的扫描超时时间
+
+    Args:
+        file_path: 文件的完整路径
+        max_timeout: 超时上限（秒），不按大小计算时即为超时时间
+        adaptive: 是否按文件大小计算
+
+    Returns:
+        超时秒数
+    """
+    if not adaptive:
+        return max_timeout
+    try:
+        size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    except OSError:
+        return max_timeout
+    return min(max_timeout, int(ADAPTIVE_TIMEOUT_BASE + ADAPTIVE_TIMEOUT_PER_MB * size_mb))
+
+
+def sort_largest_first(files_to_scan, logger: logging.Logger, stat_threads: int = 8) -> list:
+    """
+    获取所有待扫描文件的大小并按从大到小排序（LPT 调度）
+
+    大文件先扫描，避免少数大文件排在最后拖长整体耗时。
+
+    Args:
+        files_to_scan: (idx, full_path, relative_path) 元组的可迭代对象
+        logger: 日志记录器
+        stat_threads: 获取文件大小的线程数
+
+    Returns:
+        排序后的 (idx, full_path, relative_path) 元组列表
+    """
+
+    def _size(item):
+        try:
+            return os.path.getsize(item[1])
+        except OSError:
+            return 0
+
+    files_to_scan = list(files_to_scan)
+    with ThreadPoolExecutor(max_workers=stat_threads) as executor:
+        sizes = list(executor.map(_size, files_to_scan))
+    order = sorted(range(len(files_to_scan)), key=lambda i: sizes[i], reverse=True)
+    if order:
+        logger.info(
+            f"[OK] 按文件大小从大到小调度 {len(order)} 个文件"
+            f"（最大 {sizes[order[0]] / (1024 * 1024):.1f}MB）"
+        )
+    return [files_to_scan[i] for i in order]
+
+
+def _run_timed(func, *args):
+    """
+    在线程池中执行扫描函数，并在结果中记录开始时间、占用时长和工作线程
+
+    Args:
+        func: 扫描函数，返回单个结果字典或 {idx: 结果字典}
+        *args: 扫描函数的参数
+
+    Returns:
+        扫描函数的返回值，每个结果带 timings 字典
+    """
+    started = time.time()
+    results = func(*args)
+    busy = time.time() - started
+    items = [results] if "file_path" in results else list(results.values())
+    for result in items:
+        result.setdefault("timings", {}).update(
+            start=started,
+            busy=busy / len(items),
+            worker=threading.current_thread().name,
+        )
+    return results
+
+
+def submit_scan_task(
+    executor,
+    task: list,
+    engine: str,
+    temp_dir: str,
+    logger: logging.Logger,
+    debug: bool = False,
+    prefilter_rules: dict = None,
+    timeout: int = 300,
+    adaptive_timeout: bool = False,
+    extract: tuple = (),
+    display_path: str = None,
+):
+    """
+    按扫描引擎将一个任务提交到线程池/进程池
+
+    Args:
+        executor: 线程池、进程池或 cluster 引擎的协调节点
+        task: (idx, full_path, relative_path) 元组列表
+        engine: 扫描引擎名称
+        temp_dir: 本次运行的临时目录
+        logger: 日志记录器
+        debug: 是否返回 scancode 原始结果供写入调试归档
+        prefilter_rules: 预筛规则，None 表示不预筛
+        timeout: 单个文件的超时时间（秒），按大小计算时为上限
+        adaptive_timeout: 是否按文件大小计算超时时间
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+        display_path: subprocess 引擎日志和结果中使用的路径（重试扫描截取的文件开头时
+            为原文件路径），None 表示与任务中的路径相同
+
+    Returns:
+        Future 对象，submitted_at 属性为提交时间（用于统计排队耗时）
+    """
+    idx, full_path, _ = task[0]
+    submitted_at = time.time()
+    if engine == "inprocess":
+        future = executor.submit(
+            scan_chunk_inprocess,
+            [(i, p, file_timeout(p, timeout, adaptive_timeout)) for i, p, _ in task],
+            prefilter_rules,
+            debug,
+            extract,
+        )
+    elif engine == "cluster":
+        # 由工作节点租借扫描，超时等配置由协调节点统一下发
+        future = executor.submit_batch(task)
+    elif engine == "batch":
+        batch_dir = os.path.join(temp_dir, f"batch_{idx}")
+        future = executor.submit(
+            _run_timed,
+            scan_batch_with_scancode,
+            [(i, p, file_timeout(p, timeout, adaptive_timeout)) for i, p, _ in task],
+            batch_dir,
+            logger,
+            debug,
+            prefilter_rules,
+            extract,
+        )
+    else:
+        future = executor.submit(
+            _run_timed,
+            scan_file_with_scancode,
+            full_path,
+            logger,
+            debug,
+            prefilter_rules,
+            file_timeout(full_path, timeout, adaptive_timeout),
+            extract,
+            display_path,
+        )
+    future.submitted_at = submitted_at
+    return future
+
+
+def retry_timed_out_files(submit, recorder, temp_dir: str, logger: logging.Logger) -> int:
+    """
+    在所有文件扫描完成后，对超时的文件只扫描文件开头再重试一次
+
+    Args:
+        submit: 提交一个任务并返回 Future 的函数（使用固定超时），第二个参数为原文件路径，
+            供日志和错误信息使用
+        recorder: 结果记录器，其 timed_out 中为超时的文件
+        temp_dir: 本次运行的临时目录，用于存放截取的文件开头
+        logger: 日志记录器
+
+    Returns:
+        重试的文件数
+    """
+    timed_out, recorder.timed_out = recorder.timed_out, []
+    if not timed_out:
+        return 0
+    logger.info(
+        f"[WARN] {len(timed_out)} 个文件扫描超时，只扫描文件开头 {RETRY_HEAD_KB}KB 重试一次"
+    )
+    futures = {}
+    for idx, full_path, relative_path in timed_out:
+        retry_path = os.path.join(temp_dir, "retry", str(idx), Path(full_path).name)
+        try:
+            os.makedirs(os.path.dirname(retry_path))
+            with open(full_path, "rb") as src, open(retry_path, "wb") as dst:
+                dst.write(src.read(RETRY_HEAD_KB * 1024))
+        except OSError as e:
+            logger.warning(f"无法截取文件 {full_path}: {str(e)}")
+            continue
+        futures[submit([(idx, retry_path, relative_path)], full_path)] = [
+            (idx, full_path, relative_path)
+        ]
+    for future in as_completed(futures):
+        recorder.record(futures.pop(future), future, retry=True)
+    return len(timed_out)
+
+
+class ResultRecorder:
+    """扫描结果记录器 - 统一处理结果日志、结果缓存、重复文件和进度保存"""
+
+    def __init__(
+        self,
+        progress_mgr: ProgressManager,
+        logger: logging.Logger,
+        log_results: bool = True,
+        cache_stage: ResultCacheStage = None,
+        fingerprints: dict = None,
+        retry_timeouts: bool = False,
+        debug_archive: DebugArchive = None,
+        profiler: RunProfiler = None,
+        status: ScanStatus = None,
+    ):
+        """
+        初始化结果记录器
+
+        Args:
+            progress_mgr: 进度管理器
+            logger: 日志记录器
+            log_results: 是否由主进程记录每个文件的扫描结果（subprocess 引擎自己记录）
+            cache_stage: 结果缓存阶段，None 表示不启用结果缓存
+            fingerprints: {idx: 文件指纹}
+            retry_timeouts: 是否收集超时的文件，供扫描结束后重试
+            debug_archive: 调试归档，None 表示不保存 scancode 原始结果
+            profiler: 性能分析器，None 表示不记录各阶段耗时（结果中也不保存 timings）
+            status: 实时扫描状态，None 表示不统计
+        """
+        self.progress_mgr = progress_mgr
+        self.logger = logger
+        self.log_results = log_results
+        self.cache_stage = cache_stage
+        self.fingerprints = fingerprints or {}
+        self.completed = 0
+        self.total = None
+        # 本次预筛跳过的文件数: {跳过原因: 文件数}
+        self.skipped = {}
+        # 关键词预筛审计: 有线索词的文件数及其中检测到 license 的数量，无线索词文件的结果
+        self.cue_audit = {"candidates": 0, "candidates_detected": 0, "no_cue": []}
+        # SPDX 标识识别的文件数，以及校验模式下与 scancode 结果不一致的文件
+        self.spdx_fast = 0
+        self.spdx_verified = 0
+        self.spdx_mismatches = []
+        # 超时待重试的文件: (idx, full_path, relative_path)，及其 (内容哈希, 内容相同的文件)
+        self.retry_timeouts = retry_timeouts
+        self.timed_out = []
+        self.retry_pending = {}
+        self.debug_archive = debug_archive
+        self.profiler = profiler
+        self.status = status
+
+    def set_total(self, submitted: int) -> int:
+        """
+        所有任务提交后设置本次需完成的总文件数
+
+        Args:
+            submitted: 提交扫描的文件数
+
+        Returns:
+            本次需完成的总文件数（含缓存命中和内容重复的文件）
+        """
+        self.total = submitted
+        if self.cache_stage is not None:
+            # 任务流已读完，命中数和重复数不再变化
+            hits = self.cache_stage.hit_count
+            duplicates = self.cache_stage.duplicate_count
+            self.total += hits + duplicates
+            self.logger.info(
+                f"[OK] 结果缓存命中 {hits} 个文件，内容重复 {duplicates} 个文件，"
+                f"实际需扫描 {submitted} 个"
+            )
+        if self.status is not None:
+            self.status.set_total(self.total)
+        return self.total
+
+    def record_cache_hits(self):
+        """将结果缓存阶段中已命中的结果批量写入进度（主线程调用）"""
+        if self.cache_stage is None:
+            return
+        hits = self.cache_stage.take_hits()
+        if not hits:
+            return
+        for idx, result in hits:
+            result.update(self.fingerprints.get(idx, {}))
+        self.progress_mgr.add_many(hits)
+        self.completed += len(hits)
+        if self.status is not None:
+            self.status.files_precompleted(len(hits))
+
+    def record(self, task: list, future, retry: bool = False):
+        """
+        记录一个已完成任务的全部结果
+
+        Args:
+            task: (idx, full_path, relative_path) 元组列表
+            future: 已完成的 Future，结果为单个结果字典或 {idx: 结果字典}
+            retry: 是否为超时文件的重试（扫描的是截取的文件开头，结果覆盖之前的超时结果）
+        """
+        self.record_cache_hits()
+        relative_paths = {i: r for i, _, r in task}
+        full_paths = {i: p for i, p, _ in task}
+        if self.status is not None:
+            self.status.task_done(len(task))
+        try:
+            task_results = future.result()
+            if "file_path" in task_results:
+                task_results = {task[0][0]: task_results}
+        except Exception as e:
+            self.logger.error(
+                f"处理第 {', '.join(str(i + 2) for i, _, _ in task)} 行出错: {str(e)}"
+            )
+            task_results = {
+                idx: {
+                    "file_path": file_path,
+                    "license_expression_spdx": None,
+                    "error": str(e),
+                }
+                for idx, file_path, _ in task
+            }
+
+        for idx, result in task_results.items():
+            if retry:
+                result["file_path"] = full_paths[idx]
+                result["retried"] = "head"
+            # 原始结果只写入调试归档，不进入进度文件
+            raw = result.pop("debug", None)
+            if raw is not None and self.debug_archive is not None:
+                self.debug_archive.write(idx, result["file_path"], raw)
+            timings = result.pop("timings", None)
+            if self.profiler is not None and timings is not None:
+                submitted_at = getattr(future, "submitted_at", None)
+                if submitted_at is not None and "start" in timings:
+                    timings["queue"] = max(0.0, timings["start"] - submitted_at)
+                result["timings"] = {
+                    k: round(v, 4) if isinstance(v, float) else v for k, v in timings.items()
+                }
+            if self.log_results:
+                # 工作进程/批量扫描不逐个写日志，由主进程统一记录
+                if result["error"]:
+                    self.logger.error(f"文件 {result['file_path']}: {result['error']}")
+                elif result.get("skipped"):
+                    self.logger.info(
+                        f"文件 {result['file_path']} 预筛跳过: {result['skipped']}",
+                        extra=PER_FILE_LOG,
+                    )
+                else:
+                    self.logger.info(
+                        f"文件 {result['file_path']} 扫描完成，检测到license: "
+                        f"{result['license_expression_spdx'] or '无'}",
+                        extra=PER_FILE_LOG,
+                    )
+            content_hash, duplicates = None, []
+            if retry:
+                content_hash, duplicates = self.retry_pending.pop(idx, (None, []))
+            elif self.cache_stage is not None:
+                content_hash, duplicates = self.cache_stage.take(idx)
+            if content_hash is not None:
+                result["content_hash"] = content_hash
+                # 预筛、SPDX 快速识别和重试的结果取决于规则而非扫描选项，不写入结果缓存
+                if not (result.get("skipped") or result.get("fast_path") or retry):
+                    self.cache_stage.result_cache.put(content_hash, result)
+            # 内容相同的文件直接复用本结果
+            result["relative_path"] = normalize_relative_path(relative_paths[idx])
+            if result.get("timed_out") and self.retry_timeouts and not retry:
+                # 重试时内容相同的文件随代表文件一起更新
+                self.timed_out.append((idx, full_paths[idx], relative_paths[idx]))
+                self.retry_pending[idx] = (content_hash, duplicates)
+            # 阶段耗时只属于实际扫描的代表文件
+            shared = {k: v for k, v in result.items() if k != "timings"}
+            same_content = [(idx, result)] + [
+                (
+                    dup_idx,
+                    dict(
+                        shared,
+                        file_path=dup_path,
+                        relative_path=normalize_relative_path(dup_relative_path),
+                        cached=True,
+                    ),
+                )
+                for dup_idx, dup_path, dup_relative_path in duplicates
+            ]
+            for done_idx, done_result in same_content:
+                if done_result.get("skipped"):
+                    reason = done_result["skipped"]
+                    self.skipped[reason] = self.skipped.get(reason, 0) + 1
+                elif done_result.get("no_cue"):
+                    self.cue_audit["no_cue"].append(
+                        {
+                            "relative_path": done_result["relative_path"],
+                            "license_expression_spdx": done_result["license_expression_spdx"],
+                            "error": done_result["error"],
+                        }
+                    )
+                elif not done_result["error"]:
+                    self.cue_audit["candidates"] += 1
+                    if done_result["license_expression_spdx"]:
+                        self.cue_audit["candidates_detected"] += 1
+                if done_result.get("fast_path") == "spdx":
+                    self.spdx_fast += 1
+                elif done_result.get("spdx_identifier") and not done_result["error"]:
+                    # 校验模式：比较 SPDX 标识与 scancode 完整扫描的结果
+                    self.spdx_verified += 1
+                    if not spdx_expressions_equivalent(
+                        done_result["spdx_identifier"], done_result["license_expression_spdx"]
+                    ):
+                        self.spdx_mismatches.append(
+                            (
+                                done_result["file_path"],
+                                done_result["spdx_identifier"],
+                                done_result["license_expression_spdx"],
+                            )
+                        )
+                # 记录文件指纹，供下次增量扫描比较
+                done_result.update(self.fingerprints.get(done_idx, {}))
+                # 实时保存进度（重试结果覆盖同一行号的超时结果）
+                persist_started = time.time()
+                self.progress_mgr.add(done_idx, done_result)
+                if done_result.get("timings"):
+                    self.profiler.add(
+                        done_result["file_path"],
+                        dict(done_result["timings"], persist=time.time() - persist_started),
+                    )
+                if self.status is not None:
+                    self.status.file_done(done_result, retry)
+                if retry:
+                    continue
+                self.completed += 1
+                self.logger.info(
+                    f"进度: {self.completed}/{self.total or '?'} "
+                    f"(总已扫描: {self.progress_mgr.count()})",
+                    extra=PER_FILE_LOG,
+                )
+
+
+def write_cue_audit_report(report_file: str, cue_audit: dict, logger: logging.Logger):
+    """
+    输出关键词预筛的漏检报告
+
+    审计模式下没有线索词的文件仍做了完整扫描，其中检测到 license 的即为
+    关键词预筛会漏掉的文件（假阴性）。
+
+    Args:
+        report_file: 报告 JSON 文件路径
+        cue_audit: ResultRecorder.cue_audit
+        logger: 日志记录器
+    """
+    no_cue = [r for r in cue_audit["no_cue"] if not r["error"]]
+    false_negatives = [r for r in no_cue if r["license_expression_spdx"]]
+    scanned = cue_audit["candidates"] + len(no_cue)
+    detected = cue_audit["candidates_detected"] + len(false_negatives)
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "cues": [cue.decode("utf-8") for cue in LICENSE_CUES],
+        "scanned_files": scanned,
+        "candidate_files": cue_audit["candidates"],
+        "no_cue_files": len(no_cue),
+        "skip_ratio": round(len(no_cue) / scanned, 4) if scanned else 0.0,
+        "detected_files": detected,
+        "false_negatives": len(false_negatives),
+        # 被关键词预筛漏掉的检测结果占全部检测结果的比例
+        "false_negative_rate": round(len(false_negatives) / detected, 4) if detected else 0.0,
+        "false_negative_files": sorted(false_negatives, key=lambda r: r["relative_path"]),
+    }
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    logger.info(
+        f"[OK] 关键词预筛审计: 无线索词 {report['no_cue_files']}/{scanned} 个文件，"
+        f"漏检 {report['false_negatives']}/{detected} 个 license，报告已保存到: {report_file}"
+    )
+
+
+def log_scan_plan(
+    logger: logging.Logger, args, input_counts: dict, use_resume: bool, total_to_scan: int
+):
+    """所有任务提交后记录输入行数、跳过数和本次需扫描的文件数"""
+    if args.discover:
+        logger.info(f"目录中共发现 {input_counts['rows']} 个文件")
+    else:
+        logger.info(f"输入文件共 {input_counts['rows']} 行")
+    if use_resume and input_counts["skipped"] > 0:
+        logger.info(
+            f"[OK] 跳过了 {input_counts['skipped']} 个已扫描文件，本次需扫描 {total_to_scan} 个"
+        )
+    else:
+        logger.info(f"需要扫描的文件数: {total_to_scan}")
+
+
+def run_scan_pipeline(submit, tasks, recorder: ResultRecorder, queue_size: int, on_submitted):
+    """
+    流水线方式运行扫描：提交线程从任务流中取任务提交扫描，主线程同时保存完成的结果
+
+    任务流本身由清单读取或目录遍历（遍历线程）逐个产出，因此发现、扫描、保存三个阶段
+    同时进行；同时在途的任务数不超过 queue_size，已完成但未保存的结果也不会超过该数。
+
+    Args:
+        submit: 提交一个任务并返回 Future 的函数
+        tasks: 任务的迭代器
+        recorder: 结果记录器
+        queue_size: 同时在途（已提交未保存）的最大任务数
+        on_submitted: 所有任务提交后调用，参数为提交的文件数
+
+    Returns:
+        提交扫描的文件数
+    """
+    slots = threading.BoundedSemaphore(queue_size)
+    # 在途任务不超过 queue_size，因此完成回调向该队列放入时不会阻塞
+    done_queue = queue.Queue(maxsize=queue_size + 1)
+    feed_state = {"tasks": 0, "files": 0, "error": None}
+
+    def _feed():
+        try:
+            for task in tasks:
+                slots.acquire()
+                future = submit(task)
+                feed_state["tasks"] += 1
+                feed_state["files"] += len(task)
+                future.add_done_callback(lambda f, t=task: done_queue.put((t, f)))
+        except Exception as e:
+            feed_state["error"] = e
+        finally:
+            done_queue.put(None)
+
+    feeder = threading.Thread(target=_feed, name="scan-feeder", daemon=True)
+    feeder.start()
+
+    recorded = 0
+    feeding = True
+    while feeding or recorded < feed_state["tasks"]:
+        item = done_queue.get()
+        if item is None:
+            feeding = False
+            if feed_state["error"] is not None:
+                raise feed_state["error"]
+            on_submitted(feed_state["files"])
+            continue
+        task, future = item
+        recorder.record(task, future)
+        recorded += 1
+        slots.release()
+    feeder.join()
+    return feed_state["files"]
+
+
+def run_scan_window(submit, tasks, recorder: ResultRecorder, max_in_flight: int, on_submitted):
+    """
+    有界提交窗口：在途任务达到上限时先等待并保存完成的结果，再从任务流中取下一个任务
+
+    与一次性提交全部任务相比，Future 和任务参数的内存占用与清单大小无关。
+
+    Args:
+        submit: 提交一个任务并返回 Future 的函数
+        tasks: 任务的迭代器
+        recorder: 结果记录器
+        max_in_flight: 同时在途（已提交未保存）的最大任务数，0 表示不限制
+        on_submitted: 所有任务提交后调用，参数为提交的文件数
+
+    Returns:
+        提交扫描的文件数
+    """
+    futures = {}
+    submitted = 0
+    for task in tasks:
+        while max_in_flight and len(futures) >= max_in_flight:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                recorder.record(futures.pop(future), future)
+        futures[submit(task)] = task
+        submitted += len(task)
+    on_submitted(submitted)
+
+    for future in as_completed(futures):
+        recorder.record(futures.pop(future), future)
+    return submitted
+
+
+def iter_discovered_files(
+    source_dir: str,
+    walk_options: dict,
+    start_idx: int = 0,
+    skip_paths: set = None,
+    counts: dict = None,
+):
+    """
+    遍历目录并逐个产出待扫描文件（目录发现模式）
+
+    Args:
+        source_dir: 要遍历的目录（即路径前缀）
+        walk_options: 传给 gen_input_from_dir.iter_source_files 的过滤参数
+        start_idx: 第一个新文件的行号（接续已有进度时从最大行号之后开始）
+        skip_paths: 已扫描文件的相对路径集合（使用 / 分隔）
+        counts: 可选，统计字典，累加 "rows"（发现数）和 "skipped"（跳过数）
+
+    Yields:
+        (idx, full_path, relative_path) 元组
+    """
+    counts = counts if counts is not None else {}
+    counts.setdefault("rows", 0)
+    counts.setdefault("skipped", 0)
+    idx = start_idx
+    for rel_path, _, _ in iter_source_files(source_dir, **walk_options):
+        counts["rows"] += 1
+        if skip_paths and normalize_relative_path(rel_path) in skip_paths:
+            counts["skipped"] += 1
+            continue
+        yield idx, os.path.join(source_dir, rel_path), rel_path
+        idx += 1
+
+
+def iter_batches(files_to_scan, batch_size: int, batch_bytes: int):
+    """
+    按文件数和总字节数将待扫描文件分批
+
+    Args:
+        files_to_scan: (idx, full_path, relative_path) 元组的可迭代对象
+        batch_size: 每批最多文件数
+        batch_bytes: 每批文件总大小上限（字节），单个超大文件独占一批
+
+    Yields:
+        批次，每批是 (idx, full_path, relative_path) 元组列表
+    """
+    current = []
+    current_bytes = 0
+    for item in files_to_scan:
+        try:
+            size = os.path.getsize(item[1])
+        except OSError:
+            size = 0
+        if current and (
+            len(current) >= batch_size or current_bytes + size > batch_bytes
+        ):
+            yield current
+            current = []
+            current_bytes = 0
+        current.append(item)
+        current_bytes += size
+    if current:
+        yield current
+
+
+def iter_scan_tasks(
+    files_to_scan, engine: str, chunk_size: int, batch_size: int, batch_bytes: int
+):
+    """
+    按扫描引擎将待扫描文件组织为提交给线程池/进程池的任务
+
+    Args:
+        files_to_scan: (idx, full_path, relative_path) 元组的可迭代对象
+        engine: 扫描引擎名称
+        chunk_size: inprocess 引擎每个任务的文件数
+        batch_size: batch/cluster 引擎每批最多文件数
+        batch_bytes: batch/cluster 引擎每批总大小上限（字节）
+
+    Yields:
+        任务，每个任务是 (idx, full_path, relative_path) 元组列表
+    """
+    if engine in ("batch", "cluster"):
+        yield from iter_batches(files_to_scan, batch_size, batch_bytes)
+        return
+    size = chunk_size if engine == "inprocess" else 1
+    iterator = iter(files_to_scan)
+    while True:
+        task = list(itertools.islice(iterator, size))
+        if not task:
+            return
+        yield task
+
+
+def _stage_file(src: str, dst: str):
+    """将文件放入暂存目录：优先使用硬链接，跨磁盘等失败时退回复制"""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def scan_batch_with_scancode(
+    batch: list,
+    batch_dir: str,
+    logger: logging.Logger,
+    debug: bool = False,
+    prefilter_rules: dict = None,
+    extract: tuple = (),
+) -> dict:
+    """
+    使用一次 scancode 命令行扫描一批文件
+
+    每个文件暂存到 batch_dir/<idx>/<文件名>，扫描后根据 files[] 中路径的
+    第一级目录名将结果映射回 Excel 行号。
+
+    Args:
+        batch: (idx, full_path, 超时秒数) 元组列表
+        batch_dir: 本批次的暂存目录（不能已存在）
+        logger: 日志记录器
+        debug: 是否在每个结果的 debug 键中返回 scancode 原始结果
+        prefilter_rules: 预筛规则，None 表示不预筛
+        extract: 额外提取的字段组（见 EXTRACT_FIELDS）
+
+    Returns:
+        {idx: 扫描结果字典}，结果格式与 scan_file_with_scancode 相同
+    """
+    results = {}
+    stage_dir = os.path.join(batch_dir, "stage")
+    os.makedirs(stage_dir)
+    timeouts = {idx: timeout for idx, _, timeout in batch}
+
+    try:
+        for idx, file_path, _ in batch:
+            results[idx] = {
+                "file_path": file_path,
+                "license_expression_spdx": None,
+                "error": None,
+            }
+            if not os.path.exists(file_path):
+                results[idx]["error"] = f"文件不存在: {file_path}"
+                continue
+            prefiltered = prefilter_result(file_path, prefilter_rules, results[idx])
+            if prefiltered is not None:
+                results[idx] = prefiltered
+                continue
+            try:
+                os.makedirs(os.path.join(stage_dir, str(idx)))
+                _stage_file(file_path, os.path.join(stage_dir, str(idx), Path(file_path).name))
+            except Exception as e:
+                results[idx]["error"] = f"暂存文件失败: {str(e)}"
+
+        staged = [
+            idx
+            for idx, r in results.items()
+            if r["error"] is None and not r.get("skipped") and not r.get("fast_path")
+        ]
+        if not staged:
+            return results
+
+        logger.info(
+            f"开始批量扫描 {len(staged)} 个文件 (第 {batch[0][0] + 2} 行起)", extra=PER_FILE_LOG
+        )
+        options = scancode_cli_options(extract) + [
+            "--strip-root",
+            "--processes",
+            "1",
+            "--timeout",
+            str(max(timeouts[idx] for idx in staged)),
+            stage_dir,
+        ]
+
+        try:
+            files, process, timings = run_scancode_cli(
+                options, max(timeouts[idx] for idx in staged) + 30 * len(staged), logger
+            )
+            # 批次的阶段耗时平均分摊到每个文件
+            for idx in staged:
+                results[idx]["timings"] = {k: v / len(staged) for k, v in timings.items()}
+        except subprocess.TimeoutExpired:
+            for idx in staged:
+                results[idx]["error"] = "批量扫描超时"
+                results[idx]["timed_out"] = True
+            return results
+
+        # 部分文件出错时 scancode 返回非零，但仍会输出其余文件的结果
+        if files is None:
+            for idx in staged:
+                results[idx]["error"] = f"scancode扫描失败: {process.stderr}"
+            return results
+
+        # 将 files[] 中的条目映射回行号
+        seen = set()
+        for file_result in files:
+            if file_result.get("type") != "file":
+                continue
+            idx = int(file_result["path"].replace("\\", "/").split("/")[0])
+            if idx not in results:
+                continue
+            seen.add(idx)
+            if file_result.get("scan_errors"):
+                results[idx]["error"] = "; ".join(file_result["scan_errors"])
+                if "timeout" in results[idx]["error"].lower():
+                    results[idx]["timed_out"] = True
+            results[idx]["license_expression_spdx"] = extract_license_spdx(file_result)
+            results[idx].update(extract_scan_fields(file_result, extract))
+            if debug:
+                results[idx]["debug"] = file_result
 
-        if process.returncode != 0:
-            error_msg = f"scancode扫描失败: {process.stderr}"
-            logger.error(f"文件 {file_path}: {error_msg}")
-            result["error"] = error_msg
-            return result
+        for idx in staged:
+            if idx not in seen:
+                results[idx]["error"] = "scancode 结果中缺少该文件"
 
-        # 读取JSON结果
-        if not os.path.exists(temp_json_path):
-            error_msg = f"JSON输出文件未生成: {temp_json_path}"
-            logger.error(f"文件 {file_path}: {error_msg}")
-            result["error"] = error_msg
-            return result
+        return results
+    finally:
+        shutil.rmtree(batch_dir, ignore_errors=True)
 
-        with open(temp_json_path, "r", encoding="utf-8") as f:
-            scan_result = json.load(f)
 
-        # 如果提供了调试目录，保存 JSON 结果用于调试
-        if debug_dir:
-            try:
-                os.makedirs(debug_dir, exist_ok=True)
-                # 使用文件名作为调试文件名
-                safe_filename = Path(file_path).name.replace(" ", "_").replace(".", "_")
-                debug_json_path = os.path.join(debug_dir, f"{safe_filename}.json")
-                with open(debug_json_path, "w", encoding="utf-8") as f:
-                    json.dump(scan_result, f, ensure_ascii=False, indent=2)
-                logger.debug(f"调试 JSON 已保存: {debug_json_path}")
-            except Exception as e:
-                logger.warning(f"保存调试 JSON 失败: {str(e)}")
+def create_executor(args, logger: logging.Logger):
+    """
+    按扫描引擎创建本机的进程池或线程池
 
-        # 提取license_expression_spdx
-        license_spdx = None
-        if "files" in scan_result and len(scan_result["files"]) > 0:
-            file_result = scan_result["files"][0]
-            
-            # 方案1: 首先尝试从 detected_license_expression_spdx 获取（最直接）
-            license_spdx = file_result.get("detected_license_expression_spdx")
-            
-            # 方案2: 如果没有，从 license_detections 中获取
-            if not license_spdx and "license_detections" in file_result:
-                if file_result["license_detections"]:
-                    license_spdx = file_result["license_detections"][0].get(
-                        "license_expression_spdx"
-                    )
+    Args:
+        args: 命令行参数
+        logger: 日志记录器
 
-        result["license_expression_spdx"] = license_spdx
+    Returns:
+        inprocess 引擎为预加载 license 索引的进程池，其他引擎为线程池
+    """
+    if args.engine == "inprocess":
+        # 常驻工作进程：license 索引只加载一次，由主进程 fork 共享或在每个进程启动时加载
+        if args.worker_memory_mb and sys.platform == "win32":
+            logger.warning("[WARN] 当前平台不支持限制工作进程内存，--worker-memory-mb 将被忽略")
+        start_method = worker_start_method(
+            args.index_sharing, args.max_tasks_per_worker, logger
+        )
+        mp_context = multiprocessing.get_context(start_method)
+        if start_method == "fork":
+            logger.info("在主进程中加载 license 索引，工作进程通过 fork 共享")
+            logger.info(f"[OK] license 索引已加载 ({preload_scancode_index():.1f}秒)")
+        elif start_method == "forkserver":
+            mp_context.set_forkserver_preload(get_backend().preload_modules)
         logger.info(
-            f"文件 {file_path} 扫描完成，检测到license: {license_spdx or '无'}"
+            f"启动 {args.workers} 个 scancode 工作进程（{start_method}）并预加载 license 索引"
         )
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=mp_context,
+            initializer=_init_scancode_worker,
+            initargs=(args.worker_memory_mb, get_backend()),
+            max_tasks_per_child=args.max_tasks_per_worker,
+        )
+        if start_method == "fork":
+            # 进程池默认在第一次提交任务时才 fork，此时状态汇报、进度写入等线程可能已在运行；
+            # 每个工作进程先执行一个空任务，确保全部在创建进程池时就启动
+            wait([executor.submit(os.getpid) for _ in range(args.workers)])
+        return executor
+    return ThreadPoolExecutor(max_workers=args.threads)
 
-        return result
 
-    except subprocess.TimeoutExpired:
-        error_msg = f"扫描超时 (5分钟)"
-        logger.error(f"文件 {file_path}: {error_msg}")
-        result["error"] = error_msg
-        return result
-    except Exception as e:
-        error_msg = f"扫描出错: {str(e)}"
-        logger.error(f"文件 {file_path}: {error_msg}")
-        result["error"] = error_msg
-        return result
-    finally:
-        # 清理临时JSON文件
-        if os.path.exists(temp_json_path):
-            try:
-                os.remove(temp_json_path)
-            except Exception as e:
-                logger.warning(f"删除临时文件失败 {temp_json_path}: {str(e)}")
+def run_worker_node(args, logger: logging.Logger):
+    """
+    作为工作节点加入协调节点：循环租借批次，在本机按 -e 指定的引擎扫描并提交结果
+
+    清单中的相对路径与本机的路径前缀拼接，因此各节点可以把源码树挂载在不同位置。
+    预筛规则、超时和额外提取字段使用协调节点下发的配置。
+
+    Args:
+        args: 命令行参数
+        logger: 日志记录器
+    """
+    worker = ClusterWorker(args.join, logger, args.cluster_token)
+    config = worker.fetch_config(socket.gethostname())
+    prefilter_rules = config["prefilter_rules"]
+    if prefilter_rules is not None:
+        prefilter_rules["skip_extensions"] = set(prefilter_rules["skip_extensions"])
+    extract = tuple(config["extract"])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with create_executor(args, logger) as executor:
+
+            def scan(leased):
+                files = [(idx, join_prefix(args.prefix, rel), rel) for idx, rel in leased]
+                futures = {}
+                for task in iter_scan_tasks(
+                    files, args.engine, args.chunk_size, args.batch_size, args.batch_mb * 1024 * 1024
+                ):
+                    future = submit_scan_task(
+                        executor,
+                        task,
+                        args.engine,
+                        temp_dir,
+                        logger,
+                        config["debug"],
+                        prefilter_rules,
+                        config["timeout"],
+                        config["adaptive_timeout"],
+                        extract,
+                    )
+                    futures[future] = task
+                results = {}
+                for future in as_completed(futures):
+                    task = futures[future]
+                    try:
+                        task_results = future.result()
+                        if "file_path" in task_results:
+                            task_results = {task[0][0]: task_results}
+                    except Exception as e:
+                        task_results = {
+                            idx: {
+                                "file_path": file_path,
+                                "license_expression_spdx": None,
+                                "error": str(e),
+                            }
+                            for idx, file_path, _ in task
+                        }
+                    results.update(task_results)
+                logger.info(f"批次完成: {len(results)} 个文件", extra=PER_FILE_LOG)
+                return results
+
+            worker.run(scan, config["lease_seconds"], args.worker_leases)
 
 
 def main():
@@ -241,28 +2406,348 @@ def main():
     parser.add_argument(
         "prefix",
         type=str,
-        help="相对路径的前缀（例如: C:\\path\\to\\project）",
+        help="相对路径的前缀，目录发现模式下为要遍历的目录（例如: C:\\path\\to\\project）",
     )
     parser.add_argument(
         "-i",
         "--input",
         type=str,
         default="input.xlsx",
-        help="输入Excel文件路径 (default: input.xlsx)",
+        help="输入清单文件路径，支持 .xlsx/.csv/.parquet，按行流式读取 (default: input.xlsx)",
     )
     parser.add_argument(
         "-o",
         "--output",
         type=str,
         default="output.xlsx",
-        help="输出Excel文件路径 (default: output.xlsx)",
+        help="输出文件路径，支持 .xlsx/.csv/.parquet (default: output.xlsx)",
+    )
+    parser.add_argument(
+        "--output-writer",
+        type=str,
+        choices=["stream", "pandas"],
+        default="stream",
+        help=(
+            "输出方式: stream 逐行合并并流式写出，内存占用与行数无关; "
+            "pandas 读入整个表格后一次性合并写出 (default: stream)"
+        ),
     )
     parser.add_argument(
         "-t",
         "--threads",
         type=int,
         default=4,
-        help="并行扫描的线程数 (default: 4)",
+        help="subprocess/batch 引擎并行扫描的线程数 (default: 4)",
+    )
+    parser.add_argument(
+        "--discover",
+        action="store_true",
+        help=(
+            "目录发现模式：直接遍历路径前缀目录并扫描发现的文件，不读取输入清单；"
+            "行号按发现顺序分配，多次运行的顺序不固定（--incremental 时按路径排序）"
+        ),
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=None,
+        help="目录发现模式下只扫描匹配的文件，glob 模式，可多次指定",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=None,
+        help="目录发现模式下排除匹配的文件或目录，glob 模式，可多次指定",
+    )
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=None,
+        help="目录发现模式下的最小文件大小，单位字节 (default: 不限制)",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        default=None,
+        help="目录发现模式下的最大文件大小，单位字节 (default: 不限制)",
+    )
+    parser.add_argument(
+        "--walk-threads",
+        type=int,
+        default=8,
+        help="目录发现模式下并行遍历目录的线程数 (default: 8)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help=(
+            "流水线模式：读取清单/遍历目录、扫描、保存结果同时进行，"
+            "结果完成即写入进度文件 (建议配合 --progress-backend journal 或 sqlite)"
+        ),
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="流水线模式下同时在途（已提交未保存）的最大任务数 (default: 64)",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=None,
+        help=(
+            "非流水线模式下同时在途（已提交未保存）的最大任务数，有空位时才继续读取清单，"
+            "内存占用与清单大小无关；0 表示一次性提交全部任务 (default: 并行数的4倍)"
+        ),
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        type=str,
+        choices=["subprocess", "inprocess", "batch", "cluster"],
+        default="subprocess",
+        help=(
+            "扫描引擎: subprocess 为每个文件启动一次 scancode 命令行; "
+            "inprocess 使用常驻工作进程并预加载 license 索引，只在启动时加载一次; "
+            "batch 将多个文件分批交给一次 scancode 命令行扫描; "
+            "cluster 本机作为协调节点，按 --batch-size 分批租借给 --join 加入的工作节点扫描 "
+            "(default: subprocess)"
+        ),
+    )
+    parser.add_argument(
+        "--cluster-bind",
+        type=str,
+        default="127.0.0.1:8765",
+        help="cluster 引擎下协调节点监听的地址 HOST:PORT (default: 127.0.0.1:8765)",
+    )
+    parser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=300,
+        help="cluster 引擎下批次租约的有效期，工作节点超过该时间未续租时批次重新分配 (default: 300)",
+    )
+    parser.add_argument(
+        "--join",
+        type=str,
+        default=None,
+        metavar="URL",
+        help=(
+            "作为工作节点加入协调节点（例如 http://10.0.0.5:8765），用 -e 指定的引擎扫描租借的批次；"
+            "prefix 为本机上源码树的路径 (default: 不加入)"
+        ),
+    )
+    parser.add_argument(
+        "--worker-leases",
+        type=int,
+        default=2,
+        help="工作节点同时持有的租约数，扫描一个批次时预先租借下一个批次 (default: 2)",
+    )
+    parser.add_argument(
+        "--cluster-token",
+        type=str,
+        default=None,
+        help="协调节点与工作节点之间的共享口令 (default: 不校验)",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help=f"inprocess 引擎的工作进程数 (default: CPU核心数 {os.cpu_count() or 1})",
+    )
+    parser.add_argument(
+        "--worker-memory-mb",
+        type=int,
+        default=None,
+        help="inprocess 引擎下单个工作进程的内存上限，单位MB，仅Linux/macOS有效 (default: 不限制)",
+    )
+    parser.add_argument(
+        "--max-tasks-per-worker",
+        type=int,
+        default=None,
+        help="inprocess 引擎下每个工作进程处理多少个任务块后重启，用于回收内存 (default: 不重启)",
+    )
+    parser.add_argument(
+        "--index-sharing",
+        type=str,
+        choices=["auto", "fork", "forkserver", "spawn"],
+        default="auto",
+        help=(
+            "inprocess 工作进程共享 license 索引的方式: fork 主进程加载一次索引后 fork 出工作进程，"
+            "通过写时复制共享; forkserver 由预先导入 scancode 的服务进程启动工作进程，各自从磁盘缓存"
+            "加载索引; spawn 每个进程重新启动解释器并加载索引; auto 在 Linux 上为 fork，其他平台为 spawn "
+            "(default: auto)"
+        ),
+    )
+    parser.add_argument(
+        "--backend",
+        type=str,
+        choices=["scancode", "stub"],
+        default="scancode",
+        help=(
+            "扫描后端: scancode 调用 scancode-toolkit; stub 不做真正的检测，按文件内容确定性地生成"
+            "模拟结果，用于单独测量和优化调度层的开销 (default: scancode)"
+        ),
+    )
+    parser.add_argument(
+        "--stub-latency-ms",
+        type=float,
+        default=10,
+        help="stub 后端每个文件的模拟扫描耗时（毫秒） (default: 10)",
+    )
+    parser.add_argument(
+        "--stub-startup-ms",
+        type=float,
+        default=0,
+        help="stub 后端模拟的加载索引/启动命令行耗时（毫秒） (default: 0)",
+    )
+    parser.add_argument(
+        "--stub-error-rate",
+        type=float,
+        default=0.0,
+        help="stub 后端模拟扫描出错的文件比例（0~1，按文件内容确定） (default: 0.0)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=8,
+        help="inprocess 引擎下每次提交给工作进程的文件数 (default: 8)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=200,
+        help="batch 引擎下每批最多包含的文件数 (default: 200)",
+    )
+    parser.add_argument(
+        "--batch-mb",
+        type=float,
+        default=64,
+        help="batch 引擎下每批文件的总大小上限，单位MB (default: 64)",
+    )
+    parser.add_argument(
+        "--extract",
+        action="append",
+        default=None,
+        help=(
+            "从同一次扫描中额外提取并输出的字段组，可多次指定或用逗号分隔: "
+            f"{', '.join(EXTRACT_FIELDS)}；copyrights 需要 scancode 额外执行版权检测 "
+            "(default: 只输出 SPDX license 表达式)"
+        ),
+    )
+    parser.add_argument(
+        "--debug-json",
+        type=str,
+        nargs="?",
+        const="scancode_debug.jsonl.gz",
+        default=None,
+        help=(
+            "将 scancode 原始结果按行号追加到 gzip 压缩的 JSONL 调试归档 "
+            "(default: 不保存；仅写 --debug-json 时为 scancode_debug.jsonl.gz)"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="?",
+        const="scan_profile.json",
+        default=None,
+        help=(
+            "记录每个文件各阶段耗时（排队、加载索引、启动进程、扫描、解析、保存）并在结束时"
+            "输出吞吐量、百分位、最慢文件和工作线程利用率报告 "
+            "(default: 不记录；仅写 --profile 时为 scan_profile.json)"
+        ),
+    )
+    parser.add_argument(
+        "--timeout",
+        type=int,
+        default=300,
+        help="单个文件的扫描超时时间，单位秒；按大小计算超时时为上限 (default: 300)",
+    )
+    parser.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help=(
+            f"按文件大小计算超时时间: {ADAPTIVE_TIMEOUT_BASE}秒 + 每MB {ADAPTIVE_TIMEOUT_PER_MB}秒，"
+            "不超过 --timeout"
+        ),
+    )
+    parser.add_argument(
+        "--largest-first",
+        action="store_true",
+        help="扫描前获取所有文件大小，按从大到小调度，避免大文件排在最后拖长总耗时",
+    )
+    parser.add_argument(
+        "--no-timeout-retry",
+        action="store_true",
+        help=f"不重试超时的文件 (默认在扫描结束后只扫描文件开头 {RETRY_HEAD_KB}KB 重试一次)",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        nargs="?",
+        const="scan_cache.db",
+        default=None,
+        help=(
+            "启用按文件内容哈希的结果缓存，内容相同的文件只扫描一次，"
+            "可指定缓存文件 (default: 不启用；仅写 --cache 时为 scan_cache.db)"
+        ),
+    )
+    parser.add_argument(
+        "--cache-max-entries",
+        type=int,
+        default=500000,
+        help="结果缓存最多保留的条目数，超出后淘汰最久未使用的 (default: 500000)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        help=(
+            "扫描前预筛：按扩展名、文件头魔数、大小和二进制内容判断，"
+            "跳过不可能包含 license 文本的文件（结果记为 skipped）"
+        ),
+    )
+    parser.add_argument(
+        "--prefilter-rules",
+        type=str,
+        default=None,
+        help="预筛规则 JSON 文件，覆盖默认规则中的对应项，指定时自动启用预筛 (default: 使用默认规则)",
+    )
+    parser.add_argument(
+        "--keyword-prefilter",
+        action="store_true",
+        help=(
+            "关键词预筛：文件中没有 license/copyright/SPDX/GPL 等线索词时不调用 scancode，"
+            "结果记为 no_cue（自动启用 --prefilter）"
+        ),
+    )
+    parser.add_argument(
+        "--keyword-audit",
+        type=str,
+        default=None,
+        help=(
+            "关键词预筛审计：无线索词的文件仍完整扫描，"
+            "统计关键词预筛的漏检率并将报告写入指定 JSON 文件 (default: 不审计)"
+        ),
+    )
+    parser.add_argument(
+        "--spdx-fast-path",
+        action="store_true",
+        help=(
+            "SPDX 快速识别：文件开头有可校验的 SPDX-License-Identifier 时直接采用，"
+            "只有没有标识的文件才调用 scancode（需要 license-expression 包）"
+        ),
+    )
+    parser.add_argument(
+        "--spdx-head-kb",
+        type=int,
+        default=16,
+        help="SPDX 快速识别读取文件开头的大小，单位KB (default: 16)",
+    )
+    parser.add_argument(
+        "--spdx-verify",
+        action="store_true",
+        help="SPDX 校验模式：有标识的文件仍完整扫描，统计标识与 scancode 结果不一致的文件（自动启用 --spdx-fast-path）",
     )
     parser.add_argument(
         "-c",
@@ -275,8 +2760,22 @@ def main():
         "-p",
         "--progress-file",
         type=str,
-        default="scan_progress.json",
-        help="进度文件路径 (default: scan_progress.json)",
+        default=None,
+        help=(
+            "进度文件路径 (default: json 为 scan_progress.json，"
+            "journal 为 scan_progress.jsonl，sqlite 为 scan_progress.db)"
+        ),
+    )
+    parser.add_argument(
+        "--progress-backend",
+        type=str,
+        choices=["json", "journal", "sqlite"],
+        default="json",
+        help=(
+            "进度保存方式: json 每个结果后重写整个进度文件; "
+            "journal 每个结果追加一行，适合大型项目; "
+            "sqlite 保存到带索引的 SQLite 数据库，适合超大型项目 (default: json)"
+        ),
     )
     parser.add_argument(
         "--resume",
@@ -289,37 +2788,142 @@ def main():
         action="store_true",
         help="跳过断点接续，重新扫描所有文件",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="增量扫描：按文件路径、大小和修改时间复用上次结果，只扫描变化和新增的文件",
+    )
+    parser.add_argument(
+        "--incremental-hash",
+        action="store_true",
+        help="增量扫描时，大小相同但修改时间变化的文件再比较内容哈希",
+    )
     parser.add_argument(
         "--reset",
         action="store_true",
         help="重置进度文件并退出",
     )
+    parser.add_argument(
+        "-v",
+        "--verbose",
+        action="store_true",
+        help="控制台也输出每个文件的扫描结果和进度 (default: 只写入日志文件，控制台定期输出汇总行)",
+    )
+    parser.add_argument(
+        "--status-interval",
+        type=float,
+        default=10,
+        help="每隔多少秒输出一次进度汇总行（文件/秒、MB/秒、预计剩余时间、在途文件数、错误数），0 表示不输出 (default: 10)",
+    )
+    parser.add_argument(
+        "--status-file",
+        type=str,
+        default=None,
+        help="按 --status-interval 定期重写的 JSON 状态文件，供监控读取 (default: 不写)",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="在该端口提供指标端点: /metrics 为 Prometheus 文本格式，/status 为 JSON (default: 不启用)",
+    )
+    parser.add_argument(
+        "--metrics-host",
+        type=str,
+        default="127.0.0.1",
+        help="指标端点监听的地址 (default: 127.0.0.1)",
+    )
 
     args = parser.parse_args()
+    extract = []
+    for value in args.extract or []:
+        for group in value.split(","):
+            group = group.strip()
+            if not group:
+                continue
+            if group not in EXTRACT_FIELDS:
+                parser.error(f"--extract 不支持的字段组: {group}（可选: {', '.join(EXTRACT_FIELDS)}）")
+            if group not in extract:
+                extract.append(group)
+    args.extract = tuple(extract)
+    if args.join and args.engine == "cluster":
+        parser.error("工作节点（--join）需要用 -e 指定本机的扫描引擎，不能为 cluster")
+    if not 0.0 <= args.stub_error_rate <= 1.0:
+        parser.error("--stub-error-rate 必须在 0 到 1 之间")
+    if args.backend == "stub":
+        set_backend(
+            create_backend(
+                "stub",
+                latency_ms=args.stub_latency_ms,
+                startup_ms=args.stub_startup_ms,
+                error_rate=args.stub_error_rate,
+            )
+        )
+    if args.max_in_flight is None:
+        args.max_in_flight = 4 * (args.workers if args.engine == "inprocess" else args.threads)
+    if args.progress_file is None:
+        args.progress_file = {
+            "json": "scan_progress.json",
+            "journal": "scan_progress.jsonl",
+            "sqlite": "scan_progress.db",
+        }[args.progress_backend]
 
     # 确保 logs 目录存在
     os.makedirs("logs", exist_ok=True)
     
     # 设置日志
-    logger = setup_logging("logs")
+    logger = setup_logging("logs", args.verbose)
     logger.info("=" * 60)
     logger.info("开始license扫描任务")
     logger.info(f"输入文件: {args.input}")
     logger.info(f"输出文件: {args.output}")
     logger.info(f"路径前缀: {args.prefix}")
-    logger.info(f"并行线程数: {args.threads}")
+    logger.info(f"扫描引擎: {args.engine}")
+    if args.engine == "inprocess":
+        logger.info(f"工作进程数: {args.workers}")
+    else:
+        logger.info(f"并行线程数: {args.threads}")
     logger.info(f"进度文件: {args.progress_file}")
+    if args.extract:
+        logger.info(f"额外提取字段: {', '.join(args.extract)}")
+    if args.backend == "stub":
+        logger.warning(
+            f"[WARN] 使用 stub 扫描后端，结果为模拟数据（每个文件 {args.stub_latency_ms}ms，"
+            f"启动 {args.stub_startup_ms}ms，出错比例 {args.stub_error_rate}）"
+        )
     logger.info("=" * 60)
 
-    # 初始化进度管理器
-    progress_mgr = ProgressManager(args.progress_file, logger)
+    if args.join:
+        # 工作节点不读取清单、不保存进度，结果提交给协调节点
+        try:
+            run_worker_node(args, logger)
+        except Exception as e:
+            logger.error(f"工作节点出错: {str(e)}", exc_info=True)
+            sys.exit(1)
+        return
+
+    progress_class = {
+        "journal": JournalProgressManager,
+        "sqlite": SqliteProgressManager,
+    }.get(args.progress_backend, ProgressManager)
 
     # 处理重置选项
     if args.reset:
+        progress_mgr = progress_class(args.progress_file, logger)
         progress_mgr.reset()
+        progress_mgr.close()
         logger.info("进度已重置，请重新运行扫描")
         sys.exit(0)
 
+    # inprocess 工作进程在启动任何辅助线程（SQLite 进度写入、目录遍历、状态汇报）之前创建，
+    # fork 方式下不会在多线程进程中 fork
+    executor = None
+    if args.engine == "inprocess":
+        executor = create_executor(args, logger)
+
+    # 初始化进度管理器
+    progress_mgr = progress_class(args.progress_file, logger)
+
     # 确定是否启用断点接续
     use_resume = args.resume and not args.skip_resume
     if args.skip_resume:
@@ -328,118 +2932,373 @@ def main():
     elif use_resume:
         logger.info(f"[OK] 启用断点接续功能（进度文件: {args.progress_file}）")
 
+    result_cache = None
+    debug_archive = None
+    reporter = None
     try:
-        # 检查input.xlsx是否存在
-        if not os.path.exists(args.input):
-            logger.error(f"输入文件不存在: {args.input}")
-            sys.exit(1)
+        input_counts = {"rows": 0, "skipped": 0}
+        fingerprints = {}
+        if args.discover:
+            # 直接遍历目录，发现的文件立即进入扫描流程，不生成中间 Excel 文件
+            logger.info(f"[OK] 目录发现模式，遍历目录: {args.prefix}")
+            walk_options = {
+                "include": args.include,
+                "exclude": args.exclude,
+                "min_size": args.min_size,
+                "max_size": args.max_size,
+                "workers": args.walk_threads,
+                # 遍历线程中的错误写入日志，不输出到标准输出
+                "on_error": lambda path, e: logger.warning(f"无法读取目录 {path}: {str(e)}"),
+            }
+            if args.incremental:
+                # 增量扫描需要完整文件列表，按路径排序以保证行号稳定
+                rows = sorted(
+                    rel_path
+                    for rel_path, _, _ in iter_source_files(args.prefix, **walk_options)
+                )
+                input_counts["rows"] = len(rows)
+                files_to_scan, fingerprints = plan_incremental_scan(
+                    [
+                        (idx, os.path.join(args.prefix, rel_path), rel_path)
+                        for idx, rel_path in enumerate(rows)
+                    ],
+                    progress_mgr,
+                    logger,
+                    args.incremental_hash,
+                    tuple(key for _, key in extract_columns(args.extract)),
+                )
+            else:
+                # 断点接续按相对路径判断（目录遍历顺序不固定，不能按行号）
+                done_paths = set()
+                start_idx = 0
+                if use_resume:
+                    for idx, result in progress_mgr.iter_completed():
+                        start_idx = idx + 1
+                        if result.get("relative_path") is not None:
+                            done_paths.add(result["relative_path"])
+                files_to_scan = iter_discovered_files(
+                    args.prefix, walk_options, start_idx, done_paths, input_counts
+                )
+        else:
+            # 检查input.xlsx是否存在
+            if not os.path.exists(args.input):
+                logger.error(f"输入文件不存在: {args.input}")
+                sys.exit(1)
 
-        # 读取input.xlsx
-        logger.info(f"读取输入文件: {args.input}")
-        df_input = pd.read_excel(args.input)
+            # 流式读取输入清单：逐行交给扫描流程，不必等整个表格载入内存
+            logger.info(f"读取输入文件: {args.input}")
+            try:
+                column_values = open_input_column(args.input, args.column)
+            except (ValueError, ImportError) as e:
+                logger.error(str(e))
+                sys.exit(1)
 
-        # 检查path列是否存在
-        if args.column not in df_input.columns:
-            logger.error(f"输入文件中不存在'{args.column}'列")
-            sys.exit(1)
+            if args.incremental:
+                # 增量扫描：按路径、大小、修改时间复用上次结果，与 Excel 行号无关
+                files_to_scan, fingerprints = plan_incremental_scan(
+                    list(iter_input_files(column_values, args.prefix, logger, counts=input_counts)),
+                    progress_mgr,
+                    logger,
+                    args.incremental_hash,
+                    tuple(key for _, key in extract_columns(args.extract)),
+                )
+            else:
+                # 检查是否已扫描（断点接续）：已扫描行号在主线程一次取出，
+                # 流水线模式下由提交线程读取清单时不再访问进度数据库
+                done = progress_mgr.completed_indexes() if use_resume else None
+                files_to_scan = iter_input_files(
+                    column_values,
+                    args.prefix,
+                    logger,
+                    skip=done.__contains__ if use_resume else None,
+                    counts=input_counts,
+                )
 
-        # 构建完整文件路径
-        logger.info(f"准备扫描 {len(df_input)} 个文件")
-        files_to_scan = []
-        files_skip_count = 0
-        for idx, relative_path in enumerate(df_input[args.column]):
-            if pd.isna(relative_path):
-                logger.warning(f"第 {idx + 2} 行的path列为空")
-                continue
-            # 规范化路径：将正斜杠转换为反斜杠（Windows）并移除路径混淆
-            normalized_path = str(relative_path).replace('/', os.sep)
-            full_path = os.path.normpath(os.path.join(args.prefix, normalized_path))
-
-            # 检查是否已扫描（断点接续）
-            if use_resume and progress_mgr.exists(idx):
-                files_skip_count += 1
-                logger.debug(f"跳过已扫描文件: {full_path}")
-                continue
+        # 内容哈希缓存：命中缓存或与其他文件内容相同的文件不再重复扫描，
+        # 哈希在提交任务前逐批计算，不必先取得完整文件列表
+        cache_stage = None
+        if args.cache:
+            result_cache = ResultCache(
+                args.cache, scan_cache_key(args.extract), logger, args.cache_max_entries
+            )
+            cache_stage = ResultCacheStage(result_cache)
+            files_to_scan = cache_stage.filter(files_to_scan)
 
-            files_to_scan.append((idx, full_path, relative_path))
+        # 预筛规则：在工作线程/进程中对每个文件先做廉价判断
+        prefilter_rules = None
+        output_columns = OUTPUT_COLUMNS + extract_columns(args.extract)
+        use_prefilter = (
+            args.prefilter or args.prefilter_rules or args.keyword_prefilter or args.keyword_audit
+        )
+        use_spdx = args.spdx_fast_path or args.spdx_verify
+        if use_prefilter or use_spdx:
+            try:
+                prefilter_rules = load_prefilter_rules(args.prefilter_rules)
+            except (OSError, ValueError) as e:
+                logger.error(f"无法读取预筛规则文件 {args.prefilter_rules}: {str(e)}")
+                sys.exit(1)
+            prefilter_rules["classify"] = bool(use_prefilter)
+            if args.keyword_prefilter or args.keyword_audit:
+                prefilter_rules["require_license_cue"] = True
+            if args.keyword_audit:
+                prefilter_rules["audit_cues"] = True
+            if use_spdx:
+                prefilter_rules["spdx_fast_path"] = True
+                prefilter_rules["spdx_head_kb"] = args.spdx_head_kb
+                prefilter_rules["spdx_verify"] = args.spdx_verify
+        if use_spdx:
+            if get_spdx_licensing() is None:
+                logger.warning(
+                    "[WARN] 未安装 license-expression，无法校验 SPDX 标识，"
+                    "所有文件仍由 scancode 扫描: pip install license-expression"
+                )
+            mode = "校验模式，仍完整扫描" if args.spdx_verify else "有标识的文件不调用 scancode"
+            logger.info(f"[OK] SPDX 快速识别已启用（读取文件开头 {args.spdx_head_kb}KB，{mode}）")
+        if use_prefilter:
+            output_columns = output_columns + PREFILTER_COLUMNS
+            rule_desc = [f"{len(prefilter_rules['skip_extensions'])} 种扩展名"]
+            if prefilter_rules.get("skip_binary"):
+                rule_desc.append("二进制文件")
+            if prefilter_rules.get("skip_empty"):
+                rule_desc.append("空文件")
+            if prefilter_rules.get("max_size_mb") is not None:
+                rule_desc.append(f"大于 {prefilter_rules['max_size_mb']}MB 的文件")
+            if prefilter_rules.get("require_license_cue"):
+                rule_desc.append(
+                    "无 license 线索词的文件（审计模式，仍完整扫描）"
+                    if prefilter_rules.get("audit_cues")
+                    else "无 license 线索词的文件"
+                )
+            logger.info(f"[OK] 预筛已启用，跳过: {'、'.join(rule_desc)}")
+        if use_spdx:
+            output_columns = output_columns + SPDX_COLUMNS
 
-        if use_resume and files_skip_count > 0:
-            logger.info(f"[OK] 跳过了 {files_skip_count} 个已扫描文件，本次需扫描 {len(files_to_scan)} 个")
-        else:
-            logger.info(f"需要扫描的文件数: {len(files_to_scan)}")
+        # 调试归档：scancode 原始结果由主线程按行号追加写入压缩文件
+        if args.debug_json:
+            try:
+                debug_archive = DebugArchive(args.debug_json, logger)
+                logger.info(f"[OK] 调试模式已启用，scancode 原始结果将追加到: {args.debug_json}")
+            except OSError as e:
+                logger.warning(f"无法创建调试归档: {str(e)}")
+        debug = debug_archive is not None
 
-        # 创建调试目录以保存 scancode 的 JSON 输出
-        debug_dir = os.path.join(".", "scancode_debug_json")
-        try:
-            os.makedirs(debug_dir, exist_ok=True)
-            logger.info(f"[OK] 调试模式已启用，JSON 结果将保存到: {debug_dir}")
-        except Exception as e:
-            logger.warning(f"无法创建调试目录: {str(e)}")
-            debug_dir = None
+        if args.largest_first:
+            # LPT 调度：需要先取得完整文件列表，不再边发现边扫描
+            files_to_scan = sort_largest_first(files_to_scan, logger)
+        if args.adaptive_timeout:
+            logger.info(
+                f"[OK] 按文件大小计算超时: {ADAPTIVE_TIMEOUT_BASE}秒 + 每MB "
+                f"{ADAPTIVE_TIMEOUT_PER_MB}秒，上限 {args.timeout}秒"
+            )
 
         # 并行扫描文件
-        scan_results = {}
+        tasks = iter_scan_tasks(
+            files_to_scan,
+            args.engine,
+            args.chunk_size,
+            args.batch_size,
+            args.batch_mb * 1024 * 1024,
+        )
+        if args.engine == "batch":
+            # 分批扫描：每批文件只启动一次 scancode
+            logger.info(
+                f"[OK] 分批扫描模式，每批最多 {args.batch_size} 个文件 / {args.batch_mb}MB"
+            )
+        if args.engine == "cluster":
+            # 分布式扫描：本机作为协调节点，批次由工作节点租借扫描
+            executor = ClusterCoordinator(
+                args.cluster_bind,
+                {
+                    "prefilter_rules": (
+                        dict(prefilter_rules, skip_extensions=sorted(prefilter_rules["skip_extensions"]))
+                        if prefilter_rules is not None
+                        else None
+                    ),
+                    "debug": debug,
+                    "timeout": args.timeout,
+                    "adaptive_timeout": args.adaptive_timeout,
+                    "extract": list(args.extract),
+                },
+                logger,
+                args.lease_seconds,
+                args.cluster_token,
+            )
+            logger.info(
+                f"[OK] 分布式扫描模式，每批最多 {args.batch_size} 个文件 / {args.batch_mb}MB，"
+                f"工作节点使用 --join 加入"
+            )
+        elif executor is None:
+            executor = create_executor(args, logger)
+        profiler = None
+        if args.profile:
+            profiler = RunProfiler(
+                args.engine, args.workers if args.engine == "inprocess" else args.threads
+            )
+        status = ScanStatus()
+        reporter = StatusReporter(
+            status,
+            logger,
+            args.status_interval,
+            args.status_file,
+            args.metrics_port,
+            args.metrics_host,
+        )
+        recorder = ResultRecorder(
+            progress_mgr,
+            logger,
+            log_results=args.engine != "subprocess",
+            cache_stage=cache_stage,
+            fingerprints=fingerprints,
+            # 分布式扫描时超时文件不在协调节点上重试
+            retry_timeouts=not args.no_timeout_retry and args.engine != "cluster",
+            debug_archive=debug_archive,
+            profiler=profiler,
+            status=status,
+        )
+        reporter.start()
         with tempfile.TemporaryDirectory() as temp_dir:
-            with ThreadPoolExecutor(max_workers=args.threads) as executor:
-                futures = {}
-                for idx, full_path, relative_path in files_to_scan:
-                    temp_json = os.path.join(temp_dir, f"result_{idx}.json")
-                    future = executor.submit(
-                        scan_file_with_scancode, full_path, temp_json, logger, debug_dir
+            with executor:
+
+                def submit(task):
+                    status.task_submitted(len(task))
+                    return submit_scan_task(
+                        executor,
+                        task,
+                        args.engine,
+                        temp_dir,
+                        logger,
+                        debug,
+                        prefilter_rules,
+                        args.timeout,
+                        args.adaptive_timeout,
+                        args.extract,
                     )
-                    futures[future] = idx
 
-                # 收集结果
-                completed = 0
-                for future in as_completed(futures):
-                    idx = futures[future]
-                    try:
-                        result = future.result()
-                        scan_results[idx] = result
-                        # 实时保存进度
-                        progress_mgr.add(idx, result)
-                        completed += 1
-                        logger.info(
-                            f"进度: {completed}/{len(files_to_scan)} (总已扫描: {progress_mgr.count()})"
-                        )
-                    except Exception as e:
-                        logger.error(f"处理第 {idx + 2} 行出错: {str(e)}")
-                        error_result = {
-                            "file_path": files_to_scan[idx][1],
-                            "license_expression_spdx": None,
-                            "error": str(e),
-                        }
-                        scan_results[idx] = error_result
-                        progress_mgr.add(idx, error_result)
-
-        # 加载完整的扫描结果（包括之前扫描的）
-        all_results = progress_mgr.get_completed()
-
-        # 添加结果到DataFrame
-        logger.info("将扫描结果添加到DataFrame")
-        df_output = df_input.copy()
-        df_output["license_expression_spdx_scancode"] = None
-
-        for idx_str, result in all_results.items():
-            idx = int(idx_str)
-            if idx < len(df_output):
-                df_output.loc[idx, "license_expression_spdx_scancode"] = result.get(
-                    "license_expression_spdx"
-                )
+                def submit_retry(task, display_path):
+                    # 重试扫描截取的文件开头，使用完整的超时上限
+                    status.task_submitted(len(task))
+                    return submit_scan_task(
+                        executor,
+                        task,
+                        args.engine,
+                        temp_dir,
+                        logger,
+                        debug,
+                        None,
+                        args.timeout,
+                        False,
+                        args.extract,
+                        display_path,
+                    )
+
+                if args.pipeline:
+                    # 流水线模式：发现/读取、扫描、保存结果三个阶段同时进行
+                    logger.info(
+                        f"[OK] 流水线模式，最多 {args.queue_size} 个任务同时在队列中"
+                    )
+                    submitted = run_scan_pipeline(
+                        submit,
+                        tasks,
+                        recorder,
+                        args.queue_size,
+                        lambda n: log_scan_plan(
+                            logger, args, input_counts, use_resume, recorder.set_total(n)
+                        ),
+                    )
+                else:
+                    # 边读取清单边提交任务，在途任务达到上限时先保存完成的结果
+                    submitted = run_scan_window(
+                        submit,
+                        tasks,
+                        recorder,
+                        args.max_in_flight,
+                        lambda n: log_scan_plan(
+                            logger, args, input_counts, use_resume, recorder.set_total(n)
+                        ),
+                    )
+
+                # 任务流读完后才命中缓存的结果（没有后续任务完成时尚未写入）
+                recorder.record_cache_hits()
+                retried = retry_timed_out_files(submit_retry, recorder, temp_dir, logger)
+        reporter.stop()
+        if profiler is not None:
+            profiler.finish()
+        total_to_scan = recorder.total
 
-        # 保存结果到output.xlsx
+        progress_mgr.save()
+
+        # 合并扫描结果（包括之前扫描的）并保存输出文件
         logger.info(f"保存输出文件: {args.output}")
-        df_output.to_excel(args.output, index=False)
+        if args.discover:
+            # 目录发现模式没有输入清单，直接由扫描结果生成输出
+            output_stats = write_results_stream(
+                args.output,
+                (
+                    (idx, dict(result, file_name=os.path.basename(result.get("relative_path") or "")))
+                    for idx, result in progress_mgr.iter_completed()
+                ),
+                [("path", "relative_path"), ("file_name", "file_name")] + output_columns,
+                OUTPUT_COLUMNS[0][1],
+            )
+            total_files = output_stats["rows"]
+            detected_count = output_stats["detected"]
+        elif args.output_writer == "stream":
+            # 按行号归并清单与结果，逐行写出
+            output_stats = write_output_stream(
+                args.input, args.output, progress_mgr.iter_completed(), output_columns
+            )
+            total_files = output_stats["rows"]
+            detected_count = output_stats["detected"]
+        else:
+            df_output = read_input_table(args.input)
+            merge_results_into_dataframe(df_output, progress_mgr.iter_completed(), output_columns)
+            write_output_table(df_output, args.output)
+            total_files = len(df_output)
+            detected_count = df_output[OUTPUT_COLUMNS[0][0]].notna().sum()
         logger.info("[OK] 输出文件已保存")
 
         # 统计信息
-        detected_count = df_output["license_expression_spdx_scancode"].notna().sum()
         total_scanned = progress_mgr.count()
-        total_files = len(df_input)
         logger.info("=" * 60)
         logger.info(f"总文件数: {total_files}")
         logger.info(f"已扫描文件数: {total_scanned}")
-        logger.info(f"本次新扫描: {len(files_to_scan)}")
+        logger.info(f"本次新扫描: {total_to_scan}")
+        if submitted != total_to_scan:
+            logger.info(f"其中实际提交扫描（不含缓存命中和内容重复）: {submitted}")
+        if retried:
+            logger.info(f"超时后重试（只扫描文件开头）: {retried}")
+        if use_prefilter:
+            skipped_total = sum(recorder.skipped.values())
+            detail = ", ".join(
+                f"{reason}: {count}" for reason, count in sorted(recorder.skipped.items())
+            )
+            logger.info(f"本次预筛跳过: {skipped_total}" + (f" ({detail})" if detail else ""))
+        if args.keyword_audit:
+            write_cue_audit_report(args.keyword_audit, recorder.cue_audit, logger)
+        if profiler is not None:
+            report = profiler.write(args.profile)
+            logger.info(
+                f"[OK] 性能报告已保存到: {args.profile}（{report['files']} 个文件，"
+                f"{report['files_per_second']} 文件/秒，工作线程利用率 "
+                f"{report['worker_utilization']:.0%}）"
+            )
+            for stage, stats in report["stages"].items():
+                if stats["count"]:
+                    logger.info(
+                        f"   {stage}: 合计 {stats['total']}秒，p50 {stats['p50']}秒，"
+                        f"p90 {stats['p90']}秒，最大 {stats['max']}秒"
+                    )
+        if args.spdx_verify:
+            logger.info(
+                f"SPDX 标识校验: {recorder.spdx_verified} 个文件，"
+                f"与 scancode 结果不一致 {len(recorder.spdx_mismatches)} 个"
+            )
+            for file_path, identifier, detected in recorder.spdx_mismatches[:20]:
+                logger.info(f"   {file_path}: 标识 {identifier}，scancode {detected or '无'}")
+            if len(recorder.spdx_mismatches) > 20:
+                logger.info(f"   ... 另有 {len(recorder.spdx_mismatches) - 20} 个不一致文件")
+        elif use_spdx:
+            logger.info(f"本次由 SPDX 标识直接识别: {recorder.spdx_fast}")
         logger.info(f"检测到license的文件数: {detected_count}")
         logger.info(f"未检测到license的文件数: {total_scanned - detected_count}")
         if total_scanned < total_files:
@@ -449,10 +3308,21 @@ def main():
             logger.info("[OK] 所有文件扫描完成！")
         logger.info("=" * 60)
 
-
     except Exception as e:
         logger.error(f"任务执行出错: {str(e)}", exc_info=True)
         sys.exit(1)
+    finally:
+        # 出错退出时也要关闭指标端点和工作进程、等待进度写入线程、提交结果缓存并写完调试归档
+        if reporter is not None:
+            reporter.stop()
+        if executor is not None and args.engine == "inprocess":
+            # 提前创建的进程池（正常结束时已由 with 语句关闭，重复关闭不做任何事）
+            executor.shutdown(cancel_futures=True)
+        progress_mgr.close()
+        if result_cache is not None:
+            result_cache.close()
+        if debug_archive is not None:
+            debug_archive.close()
 
 
 if __name__ == "__main__":
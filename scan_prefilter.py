@@ -0,0 +1,351 @@
+"""
+扫描前预筛 - 在调用 scancode 之前快速识别不可能包含 license 文本的文件，
+以及直接识别带 SPDX-License-Identifier 标识的文件
+"""
+
+import json
+import mmap
+import os
+import re
+
+# 默认预筛规则，可通过 JSON 文件覆盖其中任意项
+DEFAULT_PREFILTER_RULES = {
+    # 是否按扩展名、大小、二进制内容分类跳过（只使用 SPDX 快速识别时关闭）
+    "classify": True,
+    # 按扩展名直接跳过（小写，含点）
+    "skip_extensions": [
+        ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".webp", ".tif", ".tiff", ".psd",
+        ".mp3", ".mp4", ".wav", ".avi", ".mov", ".mkv", ".flac", ".ogg",
+        ".ttf", ".otf", ".woff", ".woff2", ".eot",
+        ".o", ".obj", ".a", ".lib", ".so", ".dll", ".dylib", ".exe", ".pyc", ".class",
+        ".bin", ".img", ".iso", ".dat", ".db", ".sqlite",
+    ],
+    # 空文件跳过
+    "skip_empty": True,
+    # 超过该大小（MB）的文件跳过，None 表示不限制
+    "max_size_mb": 50,
+    # 根据文件头魔数和内容判断为二进制的文件跳过
+    "skip_binary": True,
+    # 二进制嗅探读取的字节数
+    "sniff_bytes": 8192,
+    # 关键词预筛：文件中没有任何 license 线索词时跳过（结果记为 no_cue）
+    "require_license_cue": False,
+    # 关键词预筛审计：没有线索词的文件仍完整扫描，只做标记，用于统计漏检率
+    "audit_cues": False,
+    # SPDX 快速识别：文件开头有 SPDX-License-Identifier 时直接采用，不调用 scancode
+    "spdx_fast_path": False,
+    # SPDX 快速识别读取文件开头的大小（KB）
+    "spdx_head_kb": 16,
+    # SPDX 校验模式：识别到标识的文件仍完整扫描，用于比对两者结果
+    "spdx_verify": False,
+}
+
+# license 线索词，任一命中即交给 scancode 完整扫描
+LICENSE_CUES = [
+    rb"licen[cs]",
+    rb"copyright",
+    rb"spdx",
+    rb"\b[al]?gpl",
+    rb"\bmit\b",
+    rb"\bbsd\b",
+    rb"apache",
+    rb"mozilla",
+    rb"public[\s_-]+domain",
+    rb"permission is hereby granted",
+    rb"redistribution and use",
+    rb"warrant",
+    rb"\(c\)",
+    "©".encode("utf-8"),
+]
+
+# 所有线索词编译为一个正则，一次遍历文件内容即可判断
+LICENSE_CUE_PATTERN = re.compile(b"|".join(LICENSE_CUES), re.IGNORECASE)
+
+# SPDX 标识行，表达式取到行尾
+SPDX_ID_PATTERN = re.compile(rb"SPDX-License-Identifier:[ \t]*([^\r\n]*)", re.IGNORECASE)
+
+# 表达式末尾可能跟着的注释结束符
+COMMENT_END_PATTERN = re.compile(r"\s*(\*/|-->|\*\)|--\}|#\}|%>|\?>)\s*$")
+
+_spdx_licensing = None
+
+# 常见二进制格式的文件头魔数
+MAGIC_SIGNATURES = [
+    b"\x7fELF",  # ELF 可执行文件/共享库
+    b"MZ",  # Windows PE
+    b"\xca\xfe\xba\xbe",  # Mach-O fat / Java class
+    b"\xcf\xfa\xed\xfe",  # Mach-O 64
+    b"\x89PNG",
+    b"\xff\xd8\xff",  # JPEG
+    b"GIF8",
+    b"PK\x03\x04",  # zip/jar/docx
+    b"\x1f\x8b",  # gzip
+    b"BZh",  # bzip2
+    b"\xfd7zXZ",  # xz
+    b"7z\xbc\xaf",
+    b"Rar!",
+    b"SQLite format 3",
+]
+
+# 文本编码的 BOM，带 BOM 的 UTF-16/32 文本含有 NUL 字节但不是二进制
+TEXT_BOMS = [b"\xef\xbb\xbf", b"\xff\xfe", b"\xfe\xff"]
+
+
+def load_prefilter_rules(rules_file: str = None) -> dict:
+    """
+    加载预筛规则
+
+    Args:
+        rules_file: JSON 规则文件路径，其中的键覆盖默认规则；None 表示使用默认规则
+
+    Returns:
+        规则字典
+    """
+    rules = dict(DEFAULT_PREFILTER_RULES)
+    if rules_file:
+        with open(rules_file, "r", encoding="utf-8") as f:
+            rules.update(json.load(f))
+    rules["skip_extensions"] = {ext.lower() for ext in rules.get("skip_extensions") or []}
+    return rules
+
+
+def is_binary_data(data: bytes) -> bool:
+    """
+    根据文件开头的字节判断是否为二进制内容
+
+    Args:
+        data: 文件开头的若干字节
+
+    Returns:
+        是否为二进制
+    """
+    if not data:
+        return False
+    if any(data.startswith(bom) for bom in TEXT_BOMS):
+        return False
+    if any(data.startswith(magic) for magic in MAGIC_SIGNATURES):
+        return True
+    if b"\x00" in data:
+        return True
+    # 控制字符（除常见空白外）占比过高视为二进制
+    control = sum(1 for b in data if b < 32 and b not in (9, 10, 12, 13, 27))
+    return control / len(data) > 0.3
+
+
+def has_license_cue(file_path: str) -> bool:
+    """
+    判断文件中是否出现任一 license 线索词
+
+    文件通过 mmap 映射后直接用编译好的正则搜索，不把整个文件读入内存。
+
+    Args:
+        file_path: 文件的完整路径
+
+    Returns:
+        是否包含线索词；无法读取或无法判断（如 UTF-16 文本）时返回 True，交给 scancode 处理
+    """
+    try:
+        with open(file_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return False
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # UTF-16/32 文本的字符之间有 NUL 字节，按字节匹配会漏掉
+                if data[:2] in (b"\xff\xfe", b"\xfe\xff"):
+                    return True
+                return LICENSE_CUE_PATTERN.search(data) is not None
+    except (OSError, ValueError):
+        return True
+
+
+def get_spdx_licensing():
+    """
+    获取 SPDX license 列表的表达式解析器（license-expression 为可选依赖）
+
+    Returns:
+        license_expression.Licensing 对象，未安装 license-expression 时返回 None
+    """
+    global _spdx_licensing
+    if _spdx_licensing is None:
+        try:
+            from license_expression import get_spdx_licensing as _get_spdx_licensing
+        except ImportError:
+            return None
+        _spdx_licensing = _get_spdx_licensing()
+    return _spdx_licensing
+
+
+def normalize_spdx_expression(expression: str) -> str:
+    """
+    按 SPDX license 列表校验并规范化表达式（例如 GPL-2.0+ -> GPL-2.0-or-later）
+
+    Args:
+        expression: SPDX-License-Identifier 后的表达式
+
+    Returns:
+        规范化后的表达式；无法校验（含未知标识或未安装 license-expression）时返回 None
+    """
+    licensing = get_spdx_licensing()
+    if licensing is None:
+        return None
+    try:
+        parsed = licensing.parse(expression, validate=True, strict=True)
+    except Exception:
+        return None
+    return str(parsed) if parsed is not None else None
+
+
+def find_spdx_identifier(file_path: str, head_kb: int = 16) -> str:
+    """
+    读取文件开头，解析其中的 SPDX-License-Identifier 标识
+
+    Args:
+        file_path: 文件的完整路径
+        head_kb: 读取文件开头的大小（KB）
+
+    Returns:
+        规范化后的 SPDX 表达式，有多个不同标识时用 AND 合并；
+        没有标识或任一标识无法校验时返回 None（交给 scancode 完整扫描）
+    """
+    try:
+        with open(file_path, "rb") as f:
+            head = f.read(head_kb * 1024)
+    except OSError:
+        return None
+
+    expressions = []
+    for match in SPDX_ID_PATTERN.finditer(head):
+        raw = COMMENT_END_PATTERN.sub("", match.group(1).decode("utf-8", "replace")).strip()
+        expression = normalize_spdx_expression(raw) if raw else None
+        if expression is None:
+            return None
+        if expression not in expressions:
+            expressions.append(expression)
+
+    if not expressions:
+        return None
+    if len(expressions) == 1:
+        return expressions[0]
+    return " AND ".join(
+        f"({e})" if " OR " in e or " AND " in e else e for e in expressions
+    )
+
+
+def spdx_expressions_equivalent(left: str, right: str) -> bool:
+    """
+    判断两个 SPDX 表达式是否等价（忽略顺序和括号差异）
+
+    Args:
+        left: SPDX 表达式
+        right: SPDX 表达式
+
+    Returns:
+        是否等价；无法解析时按字符串比较
+    """
+    if left == right:
+        return True
+    if not left or not right:
+        return False
+    licensing = get_spdx_licensing()
+    if licensing is None:
+        return False
+    try:
+        return licensing.is_equivalent(left, right)
+    except Exception:
+        return False
+
+
+def classify_file(file_path: str, rules: dict) -> str:
+    """
+    预筛单个文件
+
+    Args:
+        file_path: 文件的完整路径
+        rules: 预筛规则（见 load_prefilter_rules）
+
+    Returns:
+        跳过原因（"extension"、"empty"、"too_large"、"binary"、"no_cue"），需要扫描时返回 None；
+        文件不存在或无法读取时也返回 None，由扫描流程报告错误
+    """
+    if rules.get("classify", True):
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext and ext in rules["skip_extensions"]:
+            return "extension"
+
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return None
+        if size == 0 and rules.get("skip_empty"):
+            return "empty"
+        max_size_mb = rules.get("max_size_mb")
+        if max_size_mb is not None and size > max_size_mb * 1024 * 1024:
+            return "too_large"
+
+        if rules.get("skip_binary"):
+            try:
+                with open(file_path, "rb") as f:
+                    data = f.read(rules.get("sniff_bytes", 8192))
+            except OSError:
+                return None
+            if is_binary_data(data):
+                return "binary"
+
+    if rules.get("require_license_cue") and not has_license_cue(file_path):
+        return "no_cue"
+
+    return None
+
+
+def prefilter_result(file_path: str, rules: dict, result: dict) -> dict:
+    """
+    对待扫描文件执行预筛和 SPDX 快速识别（供各扫描引擎调用）
+
+    Args:
+        file_path: 文件的完整路径
+        rules: 预筛规则，None 表示不预筛
+        result: 该文件的扫描结果字典，审计/校验模式下在其中标记 no_cue、spdx_identifier
+
+    Returns:
+        文件应跳过或已由 SPDX 标识识别时返回最终结果，否则返回 None（继续完整扫描）
+    """
+    if rules is None:
+        return None
+    reason = classify_file(file_path, rules)
+    if reason == "no_cue" and rules.get("audit_cues"):
+        result["no_cue"] = True
+    elif reason:
+        return skipped_result(file_path, reason)
+
+    if rules.get("spdx_fast_path"):
+        expression = find_spdx_identifier(file_path, rules.get("spdx_head_kb", 16))
+        if expression is not None:
+            if rules.get("spdx_verify"):
+                result["spdx_identifier"] = expression
+                return None
+            return {
+                "file_path": file_path,
+                "license_expression_spdx": expression,
+                "error": None,
+                "spdx_identifier": expression,
+                "fast_path": "spdx",
+            }
+    return None
+
+
+def skipped_result(file_path: str, reason: str) -> dict:
+    """
+    生成被预筛跳过的文件的扫描结果
+
+    Args:
+        file_path: 文件的完整路径
+        reason: 跳过原因
+
+    Returns:
+        与 scancode 扫描结果格式相同的字典，带 skipped 字段
+    """
+    return {
+        "file_path": file_path,
+        "license_expression_spdx": None,
+        "error": None,
+        "skipped": reason,
+    }
@@ -0,0 +1,155 @@
+"""
+扫描性能分析 - 汇总每个文件各阶段的耗时，生成运行报告
+"""
+
+import json
+import time
+from datetime import datetime
+
+# 各阶段耗时: queue 排队等待, init 工作进程加载索引, spawn 启动 scancode 进程,
+# scan license 检测, parse 解析结果, persist 保存进度
+STAGES = ["queue", "init", "spawn", "scan", "parse", "persist"]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """
+    计算已排序数值的百分位数（最近秩法）
+
+    Args:
+        sorted_values: 升序排列的数值列表
+        pct: 百分位（0-100）
+
+    Returns:
+        百分位数，列表为空时返回 0.0
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(values: list) -> dict:
+    """
+    统计一组耗时
+
+    Args:
+        values: 耗时（秒）列表
+
+    Returns:
+        {"count", "total", "mean", "p50", "p90", "p99", "max"}
+    """
+    values = sorted(values)
+    total = sum(values)
+    return {
+        "count": len(values),
+        "total": round(total, 3),
+        "mean": round(total / len(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p90": round(percentile(values, 90), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(values[-1], 4) if values else 0.0,
+    }
+
+
+class RunProfiler:
+    """运行性能分析器 - 收集每个文件的阶段耗时并生成报告，只在主线程中使用"""
+
+    def __init__(self, engine: str, workers: int, slowest: int = 20):
+        """
+        初始化性能分析器
+
+        Args:
+            engine: 扫描引擎名称
+            workers: 并行线程数或工作进程数
+            slowest: 报告中列出的最慢文件数
+        """
+        self.engine = engine
+        self.workers = workers
+        self.slowest = slowest
+        self.started = time.time()
+        self.finished = None
+        self.first_result = None
+        self.samples = []
+
+    def add(self, file_path: str, timings: dict):
+        """
+        记录一个文件的阶段耗时
+
+        Args:
+            file_path: 文件的完整路径
+            timings: 扫描结果中的 timings 字典（见各扫描引擎）
+        """
+        if self.first_result is None:
+            self.first_result = time.time()
+        self.samples.append((file_path, timings))
+
+    def finish(self):
+        """扫描结束时调用，记录结束时间"""
+        self.finished = time.time()
+
+    def report(self) -> dict:
+        """
+        生成运行报告
+
+        Returns:
+            报告字典: 吞吐量、各阶段耗时分布、最慢文件、各工作线程/进程利用率
+        """
+        finished = self.finished or time.time()
+        wall = max(finished - self.started, 1e-9)
+        stages = {
+            stage: summarize([t[stage] for _, t in self.samples if stage in t])
+            for stage in STAGES
+        }
+
+        workers = {}
+        for _, t in self.samples:
+            worker = workers.setdefault(t.get("worker", "?"), {"files": 0, "busy_seconds": 0.0})
+            worker["files"] += 1
+            worker["busy_seconds"] += t.get("busy", 0.0)
+        for worker in workers.values():
+            worker["busy_seconds"] = round(worker["busy_seconds"], 3)
+            worker["utilization"] = round(worker["busy_seconds"] / wall, 4)
+        busy_total = sum(w["busy_seconds"] for w in workers.values())
+
+        def _duration(t):
+            return sum(t.get(stage, 0.0) for stage in ("spawn", "scan", "parse"))
+
+        slowest = sorted(self.samples, key=lambda s: _duration(s[1]), reverse=True)
+        return {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "engine": self.engine,
+            "workers": self.workers,
+            "wall_seconds": round(wall, 3),
+            "files": len(self.samples),
+            "files_per_second": round(len(self.samples) / wall, 3),
+            # 开始扫描到保存第一个结果的时间，包含工作进程启动和加载索引
+            "first_result_seconds": (
+                round(self.first_result - self.started, 3) if self.first_result else None
+            ),
+            "stages": stages,
+            "slowest_files": [
+                {
+                    "file_path": file_path,
+                    "seconds": round(_duration(t), 3),
+                    **{stage: round(t[stage], 4) for stage in STAGES if stage in t},
+                }
+                for file_path, t in slowest[: self.slowest]
+            ],
+            "worker_utilization": round(busy_total / (wall * max(self.workers, 1)), 4),
+            "worker_stats": workers,
+        }
+
+    def write(self, report_file: str) -> dict:
+        """
+        生成报告并写入 JSON 文件
+
+        Args:
+            report_file: 报告文件路径
+
+        Returns:
+            报告字典
+        """
+        report = self.report()
+        with open(report_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        return report
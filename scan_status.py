@@ -0,0 +1,310 @@
+"""
+扫描实时状态 - 统计吞吐量、预计剩余时间、在途文件数和错误数，
+定期输出进度汇总行，并可写出 JSON 状态文件或提供 Prometheus 指标
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Prometheus 指标: (指标名, 类型, 说明, 状态字典中的键)
+PROMETHEUS_METRICS = [
+    ("license_scan_files_total", "gauge", "本次需完成的文件总数", "total"),
+    ("license_scan_files_completed_total", "counter", "本次已完成的文件数", "completed"),
+    ("license_scan_bytes_completed_total", "counter", "本次已完成文件的总字节数", "bytes_done"),
+    ("license_scan_files_in_flight", "gauge", "已提交尚未完成的文件数", "in_flight"),
+    ("license_scan_errors_total", "counter", "扫描出错的文件数", "errors"),
+    ("license_scan_skipped_total", "counter", "预筛跳过的文件数", "skipped"),
+    ("license_scan_files_per_second", "gauge", "平均每秒完成的文件数", "files_per_second"),
+    ("license_scan_bytes_per_second", "gauge", "平均每秒完成的字节数", "bytes_per_second"),
+    ("license_scan_eta_seconds", "gauge", "预计剩余秒数", "eta_seconds"),
+    ("license_scan_elapsed_seconds", "gauge", "扫描已运行的秒数", "elapsed_seconds"),
+]
+
+
+def format_duration(seconds) -> str:
+    """
+    将秒数格式化为 H:MM:SS
+
+    Args:
+        seconds: 秒数，None 表示未知
+
+    Returns:
+        格式化后的字符串，未知时为 "?"
+    """
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ScanStatus:
+    """扫描实时状态 - 主线程记录完成的文件，提交线程记录在途任务，汇报线程读取快照"""
+
+    def __init__(self, completed: int = 0):
+        """
+        初始化扫描状态
+
+        Args:
+            completed: 扫描开始前已完成的文件数（例如缓存命中），不计入吞吐量
+        """
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.precompleted = completed
+        self.completed = completed
+        self.total = None
+        self.bytes_done = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.skipped = 0
+        self.finished = False
+
+    def set_total(self, total: int):
+        """所有任务提交后设置本次需完成的总文件数"""
+        with self.lock:
+            self.total = total
+
+    def files_precompleted(self, files: int):
+        """记录直接复用已有结果完成的文件（例如结果缓存命中），计入完成数但不计入吞吐量"""
+        with self.lock:
+            self.precompleted += files
+            self.completed += files
+
+    def task_submitted(self, files: int):
+        """记录提交了一个包含 files 个文件的任务"""
+        with self.lock:
+            self.in_flight += files
+
+    def task_done(self, files: int):
+        """记录一个包含 files 个文件的任务已完成"""
+        with self.lock:
+            self.in_flight -= files
+
+    def file_done(self, result: dict, retry: bool = False):
+        """
+        记录一个文件的结果
+
+        Args:
+            result: 扫描结果字典
+            retry: 是否为超时文件的重试结果（文件已计入完成数，重试成功时撤销其错误计数）
+        """
+        try:
+            size = os.path.getsize(result["file_path"])
+        except OSError:
+            size = 0
+        with self.lock:
+            if retry:
+                if not result["error"]:
+                    self.errors -= 1
+                return
+            self.completed += 1
+            self.bytes_done += size
+            if result["error"]:
+                self.errors += 1
+            elif result.get("skipped"):
+                self.skipped += 1
+
+    def finish(self):
+        """扫描结束时调用"""
+        with self.lock:
+            self.finished = True
+
+    def snapshot(self) -> dict:
+        """
+        生成当前状态
+
+        Returns:
+            状态字典: 完成数、总数、吞吐量、预计剩余时间、在途文件数、错误数等
+        """
+        with self.lock:
+            elapsed = max(time.time() - self.started, 1e-9)
+            scanned = self.completed - self.precompleted
+            files_per_second = scanned / elapsed
+            remaining = None if self.total is None else max(self.total - self.completed, 0)
+            eta = None
+            if remaining is not None and files_per_second > 0:
+                eta = round(remaining / files_per_second, 1)
+            return {
+                "updated_at": datetime.now().isoformat(timespec="seconds"),
+                "state": "finished" if self.finished else "scanning",
+                "elapsed_seconds": round(elapsed, 1),
+                "total": self.total,
+                "completed": self.completed,
+                "remaining": remaining,
+                "percent": round(self.completed / self.total * 100, 1) if self.total else None,
+                "bytes_done": self.bytes_done,
+                "files_per_second": round(files_per_second, 3),
+                "bytes_per_second": round(self.bytes_done / elapsed, 1),
+                "eta_seconds": eta,
+                "in_flight": self.in_flight,
+                "errors": self.errors,
+                "skipped": self.skipped,
+            }
+
+
+def format_status_line(snapshot: dict) -> str:
+    """
+    将状态格式化为一行进度汇总
+
+    Args:
+        snapshot: ScanStatus.snapshot() 的返回值
+
+    Returns:
+        进度汇总行
+    """
+    total = snapshot["total"] if snapshot["total"] is not None else "?"
+    percent = f" ({snapshot['percent']}%)" if snapshot["percent"] is not None else ""
+    return (
+        f"进度: {snapshot['completed']}/{total}{percent}，"
+        f"{snapshot['files_per_second']:.2f} 文件/秒，"
+        f"{snapshot['bytes_per_second'] / 1024 / 1024:.2f} MB/秒，"
+        f"在途 {snapshot['in_flight']}，错误 {snapshot['errors']}，"
+        f"预计剩余 {format_duration(snapshot['eta_seconds'])}"
+    )
+
+
+def format_prometheus(snapshot: dict) -> str:
+    """
+    将状态格式化为 Prometheus 文本格式
+
+    Args:
+        snapshot: ScanStatus.snapshot() 的返回值
+
+    Returns:
+        Prometheus 文本格式的指标，值未知的指标不输出
+    """
+    lines = []
+    for name, metric_type, help_text, key in PROMETHEUS_METRICS:
+        value = snapshot[key]
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        lines.append(f"{name} {value}")
+    lines.append("# HELP license_scan_finished 扫描是否已结束")
+    lines.append("# TYPE license_scan_finished gauge")
+    lines.append(f"license_scan_finished {int(snapshot['state'] == 'finished')}")
+    return "\n".join(lines) + "\n"
+
+
+class StatusReporter:
+    """状态汇报器 - 后台线程定期输出进度汇总行、重写 JSON 状态文件，并可提供指标端点"""
+
+    def __init__(
+        self,
+        status: ScanStatus,
+        logger: logging.Logger,
+        interval: float = 10,
+        status_file: str = None,
+        metrics_port: int = None,
+        metrics_host: str = "127.0.0.1",
+    ):
+        """
+        初始化状态汇报器
+
+        Args:
+            status: 扫描状态
+            logger: 日志记录器
+            interval: 输出进度汇总行和重写状态文件的间隔（秒），0 表示不定期输出
+            status_file: JSON 状态文件路径，None 表示不写
+            metrics_port: 指标端点端口（/metrics 为 Prometheus 文本格式，/status 为 JSON），
+                None 表示不启用
+            metrics_host: 指标端点监听的地址
+        """
+        self.status = status
+        self.logger = logger
+        self.interval = interval
+        self.status_file = status_file
+        self.metrics_port = metrics_port
+        self.metrics_host = metrics_host
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.server = None
+
+    def start(self):
+        """启动汇报线程和指标端点"""
+        if self.metrics_port is not None:
+            self._start_server()
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._loop, name="scan-status", daemon=True)
+            self.thread.start()
+
+    def _start_server(self):
+        status = self.status
+
+        class _Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                snapshot = status.snapshot()
+                path = self.path.split("?")[0]
+                if path == "/metrics":
+                    body = format_prometheus(snapshot).encode("utf-8")
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/status":
+                    body = json.dumps(snapshot, ensure_ascii=False).encode("utf-8")
+                    content_type = "application/json; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            self.server = ThreadingHTTPServer((self.metrics_host, self.metrics_port), _Handler)
+        except OSError as e:
+            self.logger.warning(f"[WARN] 无法启动指标端点 {self.metrics_host}:{self.metrics_port}: {str(e)}")
+            return
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="scan-metrics", daemon=True).start()
+        self.logger.info(
+            f"[OK] 指标端点已启动: http://{self.metrics_host}:{self.server.server_port}/metrics"
+        )
+
+    def _loop(self):
+        while not self.stop_event.wait(self.interval):
+            self.report()
+
+    def report(self):
+        """输出一行进度汇总并重写状态文件"""
+        snapshot = self.status.snapshot()
+        self.logger.info(format_status_line(snapshot))
+        self.write_status_file(snapshot)
+
+    def write_status_file(self, snapshot: dict):
+        """
+        重写 JSON 状态文件（先写临时文件再替换，读取方不会读到写了一半的文件）
+
+        Args:
+            snapshot: ScanStatus.snapshot() 的返回值
+        """
+        if not self.status_file:
+            return
+        temp_file = self.status_file + ".tmp"
+        try:
+            with open(temp_file, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(temp_file, self.status_file)
+        except OSError as e:
+            self.logger.warning(f"无法写入状态文件 {self.status_file}: {str(e)}")
+
+    def stop(self):
+        """扫描结束时调用：停止汇报线程，输出最终状态并关闭指标端点（重复调用时不做任何事）"""
+        if self.stop_event.is_set():
+            return
+        self.status.finish()
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.report()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
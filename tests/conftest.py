@@ -0,0 +1,39 @@
+"""测试公共配置：从仓库根目录导入各扫描模块"""
+
+import logging
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scan_backend import StubBackend  # noqa: E402
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger("scan-tests")
+
+
+@pytest.fixture
+def stub_results(tmp_path):
+    """用 stub 后端扫描几个临时文件，返回 [(idx, 结果字典)]"""
+    backend = StubBackend(latency_ms=0)
+    results = []
+    for idx in range(5):
+        file_path = tmp_path / f"src_{idx}.c"
+        file_path.write_text(f"int value_{idx} = {idx};\n", encoding="utf-8")
+        scan = backend.scan_file(str(file_path), deadline=float("inf"))
+        results.append(
+            (
+                idx,
+                {
+                    "file_path": str(file_path),
+                    "license_expression_spdx": scan["detected_license_expression_spdx"],
+                    "error": None,
+                    "relative_path": file_path.name,
+                },
+            )
+        )
+    return results
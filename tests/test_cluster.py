@@ -0,0 +1,132 @@
+"""ClusterCoordinator / ClusterWorker：租约过期后重新分配、结束通知"""
+
+import threading
+import time
+
+from scan_backend import StubBackend
+from scan_cluster import ClusterCoordinator, ClusterWorker
+
+
+def _task(tmp_path, names):
+    """在 tmp_path 下创建文件，返回批次 [(idx, full_path, relative_path)]"""
+    task = []
+    for idx, name in enumerate(names):
+        path = tmp_path.joinpath(*name.split("\\"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"/* {name} */\n", encoding="utf-8")
+        task.append((idx, str(path), name))
+    return task
+
+
+def _stub_scan(tmp_path, delay=0.0):
+    """工作节点的扫描函数：按相对路径在 tmp_path 下用 stub 后端扫描"""
+    backend = StubBackend(latency_ms=0)
+
+    def scan(leased):
+        time.sleep(delay)
+        results = {}
+        for idx, relative_path in leased:
+            full_path = str(tmp_path.joinpath(*relative_path.split("/")))
+            scan_result = backend.scan_file(full_path, deadline=float("inf"))
+            results[idx] = {
+                "file_path": full_path,
+                "license_expression_spdx": scan_result["detected_license_expression_spdx"],
+                "error": None,
+            }
+        return results
+
+    return scan
+
+
+def test_expired_lease_is_released_to_another_worker(tmp_path, logger):
+    coordinator = ClusterCoordinator("127.0.0.1:0", {}, logger, lease_seconds=0.2)
+    future = coordinator.submit_batch(_task(tmp_path, ["a.c", "sub\\b.c"]))
+
+    first = coordinator.handle_lease({"worker": "A"})
+    # 相对路径统一为 /
+    assert first["tasks"] == [[0, "a.c"], [1, "sub/b.c"]]
+    assert coordinator.handle_lease({"worker": "B"})["tasks"] == []
+
+    time.sleep(0.3)
+    second = coordinator.handle_lease({"worker": "B"})
+    assert second["batch_id"] == first["batch_id"]
+    assert second["lease_id"] != first["lease_id"]
+    assert coordinator.reassigned == 1
+    # 过期的租约不能再续租
+    assert coordinator.handle_heartbeat({"worker": "A", "lease_id": first["lease_id"]}) == {
+        "valid": False
+    }
+
+    results = _stub_scan(tmp_path)([(idx, rel) for idx, rel in second["tasks"]])
+    reply = coordinator.handle_complete(
+        {"worker": "B", "lease_id": second["lease_id"], "batch_id": second["batch_id"],
+         "results": {str(k): v for k, v in results.items()}}
+    )
+    assert reply["accepted"]
+    assert future.result(timeout=1)[1]["file_path"] == str(tmp_path / "sub" / "b.c")
+
+    # 原租约持有者之后提交的结果不再采用
+    late = coordinator.handle_complete(
+        {"worker": "A", "lease_id": first["lease_id"], "batch_id": first["batch_id"],
+         "results": {}}
+    )
+    assert late == {"accepted": False, "done": False}
+
+
+def test_expired_lease_result_accepted_while_batch_unfinished(tmp_path, logger):
+    coordinator = ClusterCoordinator("127.0.0.1:0", {}, logger, lease_seconds=0.1)
+    future = coordinator.submit_batch(_task(tmp_path, ["a.c"]))
+    lease = coordinator.handle_lease({"worker": "A"})
+    time.sleep(0.2)
+    coordinator.handle_lease({"worker": "B"})
+
+    # 批次尚未被其他节点完成，过期租约的结果仍然采用（第一个提交的结果为准）
+    reply = coordinator.handle_complete(
+        {"worker": "A", "lease_id": lease["lease_id"], "batch_id": lease["batch_id"],
+         "results": {"0": {"file_path": "x", "license_expression_spdx": "MIT", "error": None}}}
+    )
+    assert reply["accepted"]
+    assert future.result(timeout=1)[0]["license_expression_spdx"] == "MIT"
+
+
+class _FlakyWorker(ClusterWorker):
+    """开始一段时间内续租请求全部失败的工作节点"""
+
+    def __init__(self, *args, drop_seconds=0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.drop_until = time.time() + drop_seconds
+
+    def request(self, path, payload):
+        if path == "/heartbeat" and time.time() < self.drop_until:
+            raise ConnectionError("heartbeat dropped")
+        return super().request(path, payload)
+
+
+def test_worker_with_released_batch_exits_cleanly_after_shutdown(tmp_path, logger):
+    coordinator = ClusterCoordinator("127.0.0.1:0", {}, logger, lease_seconds=1)
+    coordinator.start()
+    url = f"http://127.0.0.1:{coordinator.server.server_port}"
+    future = coordinator.submit_batch(_task(tmp_path, ["a.c", "b.c"]))
+
+    # A 续租失败导致租约过期，但仍在扫描；B 接手并完成该批次
+    slow = _FlakyWorker(url, logger, poll_seconds=0.1, drop_seconds=1.3)
+    slow.fetch_config("A")
+    slow_thread = threading.Thread(target=slow.run, args=(_stub_scan(tmp_path, 2.5), 1))
+    slow_thread.start()
+    time.sleep(0.2)
+    fast = ClusterWorker(url, logger, poll_seconds=0.1)
+    fast.fetch_config("B")
+    fast_thread = threading.Thread(target=fast.run, args=(_stub_scan(tmp_path), 1))
+    fast_thread.start()
+
+    results = future.result(timeout=10)
+    assert sorted(results) == [0, 1]
+    coordinator.shutdown()
+    slow_thread.join(timeout=10)
+    fast_thread.join(timeout=10)
+
+    assert not slow_thread.is_alive() and not fast_thread.is_alive()
+    assert slow.finished and slow.error is None
+    assert fast.error is None
+    assert fast.stats["batches"] == 1
+    assert coordinator.reassigned == 1
@@ -0,0 +1,66 @@
+"""JournalProgressManager：不完整行恢复与压缩"""
+
+import json
+
+from scan_licenses import JournalProgressManager
+
+
+def _lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [line for line in f if line.strip()]
+
+
+def test_truncated_last_line_is_ignored_and_compacted(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.jsonl")
+    mgr = JournalProgressManager(progress_file, logger)
+    for idx, result in stub_results[:3]:
+        mgr.add(idx, result)
+    mgr.close()
+
+    # 模拟崩溃时写了一半的最后一行
+    with open(progress_file, "a", encoding="utf-8") as f:
+        f.write('{"idx": 3, "result": {"file_pa')
+
+    mgr = JournalProgressManager(progress_file, logger)
+    assert mgr.count() == 3
+    assert not mgr.exists(3)
+    assert mgr.get(1) == stub_results[1][1]
+    mgr.close()
+
+    # 加载时已重写为完整的记录
+    lines = _lines(progress_file)
+    assert len(lines) == 3
+    assert sorted(json.loads(line)["idx"] for line in lines) == [0, 1, 2]
+
+
+def test_duplicate_records_are_compacted_to_latest(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.jsonl")
+    mgr = JournalProgressManager(progress_file, logger)
+    idx, result = stub_results[0]
+    mgr.add(idx, dict(result, error="扫描超时"))
+    mgr.add(idx, result)
+    mgr.add_many(stub_results[1:])
+    mgr.close()
+    assert len(_lines(progress_file)) == len(stub_results) + 1
+
+    mgr = JournalProgressManager(progress_file, logger)
+    assert mgr.count() == len(stub_results)
+    assert mgr.get(idx)["error"] is None
+    assert [i for i, _ in mgr.iter_completed()] == [i for i, _ in stub_results]
+    mgr.close()
+    assert len(_lines(progress_file)) == len(stub_results)
+
+
+def test_append_after_reload_keeps_earlier_results(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.jsonl")
+    mgr = JournalProgressManager(progress_file, logger)
+    mgr.add_many(stub_results[:2])
+    mgr.close()
+
+    mgr = JournalProgressManager(progress_file, logger)
+    mgr.add_many(stub_results[2:])
+    mgr.close()
+
+    mgr = JournalProgressManager(progress_file, logger)
+    assert dict(mgr.iter_completed()) == dict(stub_results)
+    mgr.close()
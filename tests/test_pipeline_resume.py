@@ -0,0 +1,61 @@
+"""--pipeline 与 sqlite 进度库一起断点接续：提交线程读取清单时不访问进度数据库"""
+
+import csv
+import os
+import subprocess
+import sys
+
+from scan_licenses import SqliteProgressManager
+
+SCAN_LICENSES = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scan_licenses.py"
+)
+
+
+def test_pipeline_resume_with_sqlite(tmp_path, logger, stub_results):
+    input_file = tmp_path / "input.csv"
+    with open(input_file, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["path"])
+        for _, result in stub_results:
+            writer.writerow([result["relative_path"]])
+
+    # 上次扫描已完成前两行，标记后可确认这两行没有被重新扫描
+    progress_file = str(tmp_path / "progress.db")
+    mgr = SqliteProgressManager(progress_file, logger)
+    mgr.add_many(
+        (idx, dict(result, license_expression_spdx="resumed")) for idx, result in stub_results[:2]
+    )
+    mgr.close()
+
+    output_file = tmp_path / "output.csv"
+    proc = subprocess.run(
+        [
+            sys.executable,
+            SCAN_LICENSES,
+            str(tmp_path),
+            "-i", str(input_file),
+            "-o", str(output_file),
+            "--backend", "stub",
+            "--stub-latency-ms", "0",
+            "-w", "2",
+            "--pipeline",
+            "--progress-backend", "sqlite",
+            "-p", progress_file,
+        ],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+
+    with open(output_file, "r", encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    licenses = [row["license_expression_spdx_scancode"] for row in rows]
+    assert licenses[:2] == ["resumed", "resumed"]
+    assert licenses[2:] == [result["license_expression_spdx"] for _, result in stub_results[2:]]
+
+    mgr = SqliteProgressManager(progress_file, logger)
+    assert mgr.count() == len(stub_results)
+    mgr.close()
@@ -0,0 +1,94 @@
+"""SqliteProgressManager：结果存取往返与计数"""
+
+import sqlite3
+import threading
+
+from scan_licenses import SqliteProgressManager
+
+
+def test_round_trip_and_count(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.db")
+    mgr = SqliteProgressManager(progress_file, logger, batch_size=2)
+    mgr.add_many(stub_results[:3])
+    mgr.add(*stub_results[3])
+    # 同一行号再次写入不重复计数
+    mgr.add(*stub_results[0])
+    assert mgr.count() == 4
+    assert mgr.exists(3)
+    assert not mgr.exists(4)
+    mgr.close()
+
+    mgr = SqliteProgressManager(progress_file, logger)
+    assert mgr.count() == 4
+    assert mgr.get(2) == stub_results[2][1]
+    assert mgr.get(4) is None
+    assert list(mgr.iter_completed()) == stub_results[:4]
+    mgr.add(*stub_results[4])
+    assert mgr.count() == 5
+    assert mgr.get_completed() == {str(idx): result for idx, result in stub_results}
+    mgr.close()
+
+
+def test_content_hash_column_comes_from_result(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.db")
+    mgr = SqliteProgressManager(progress_file, logger)
+    mgr.add(0, dict(stub_results[0][1], content_hash="abc123"))
+    # 没有内容哈希的结果不读取文件计算
+    mgr.add(*stub_results[1])
+    mgr.close()
+
+    conn = sqlite3.connect(progress_file)
+    rows = dict(conn.execute("SELECT idx, content_hash FROM results"))
+    conn.close()
+    assert rows == {0: "abc123", 1: None}
+
+
+def test_reset_clears_results(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.db")
+    mgr = SqliteProgressManager(progress_file, logger)
+    mgr.add_many(stub_results)
+    mgr.save()
+    mgr.reset()
+    assert mgr.count() == 0
+    assert list(mgr.iter_completed()) == []
+    mgr.close()
+
+
+def test_exists_from_other_thread_while_adding(tmp_path, logger, stub_results):
+    progress_file = str(tmp_path / "progress.db")
+    mgr = SqliteProgressManager(progress_file, logger, batch_size=7)
+    mgr.add_many(stub_results)
+    mgr.save()
+
+    total = 2000
+    _, result = stub_results[0]
+    errors = []
+    started = threading.Event()
+
+    def query():
+        # 在另一个线程中查询：此时结果记录线程仍在 add()
+        try:
+            started.set()
+            for idx in range(total):
+                mgr.exists(idx)
+                mgr.count()
+            assert mgr.exists(0)
+        except Exception as e:
+            errors.append(e)
+
+    reader = threading.Thread(target=query)
+    reader.start()
+    started.wait()
+    for idx in range(len(stub_results), total):
+        mgr.add(idx, result)
+    reader.join()
+
+    assert errors == []
+    assert mgr.count() == total
+    assert mgr.completed_indexes() == set(range(total))
+    mgr.close()
+
+    mgr = SqliteProgressManager(progress_file, logger)
+    assert mgr.count() == total
+    assert sum(1 for _ in mgr.iter_completed(page_size=300)) == total
+    mgr.close()